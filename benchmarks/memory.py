@@ -0,0 +1,124 @@
+"""
+Memory held by the installed-package list: one dict per package versus PackageCatalog.
+
+For each size a fresh interpreter with a throwaway HOME stores synthetic
+packages, then measures with tracemalloc what stays allocated (and the peak
+while building) for the package list read back from the database.
+
+    python benchmarks/memory.py [--sizes 10000,50000] [--json out.json]
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+
+DEFAULT_SIZES = (10000, 50000)
+LOOKUPS = 100000
+
+
+def measure(build):
+    """
+    Build a structure and return (it, retained bytes, peak bytes), both
+    relative to what was allocated before.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, current - before, peak - before
+
+
+def lookup_ns(contains, names):
+    start = time.perf_counter()
+    for index in range(LOOKUPS):
+        contains(names[index % len(names)])
+    return (time.perf_counter() - start) / LOOKUPS * 1e9
+
+
+def run_worker(size):
+    from synthetic import SyntheticPackageManager, generate_packages
+    from snapshell import llm_api, utils
+    from snapshell.catalog import PackageCatalog
+    from snapshell.db import get_connection
+
+    packages = generate_packages(size)
+    manager = SyntheticPackageManager(packages)
+    utils.get_package_manager = llm_api.get_package_manager = lambda: manager
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        utils.update_database()
+    del packages, manager
+    conn = get_connection()
+
+    def stored_dicts():
+        # What fetch_system_info used to hold for the life of the process
+        return [{"name": row[0], "version": row[1]} for row in conn.execute("SELECT tool_name, version FROM system_config")]
+
+    results = {}
+    dicts, dict_bytes, dict_peak = measure(stored_dicts)
+    catalog, catalog_bytes, catalog_peak = measure(PackageCatalog.from_database)
+    names = catalog.names
+    by_name = {package["name"]: package for package in dicts}
+    results['stored'] = {
+        'dicts_kib': dict_bytes / 1024, 'dicts_peak_kib': dict_peak / 1024,
+        'catalog_kib': catalog_bytes / 1024, 'catalog_peak_kib': catalog_peak / 1024,
+        'dicts_lookup_ns': lookup_ns(by_name.__contains__, names),
+        'catalog_lookup_ns': lookup_ns(catalog.__contains__, names),
+    }
+    return results
+
+
+def run_size(size):
+    with tempfile.TemporaryDirectory(prefix='snapshell-memory-') as home:
+        env = dict(os.environ, HOME=home, PYTHONPATH=os.pathsep.join([REPO_ROOT, BENCHMARK_DIR]))
+        output = os.path.join(home, 'results.json')
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', str(size), '--json', output], env=env, check=True)
+        with open(output) as results_file:
+            return json.load(results_file)
+
+
+def print_results(results):
+    print(f"{'size':>7}  {'list':<10}{'dicts KiB':>11}{'catalog KiB':>13}{'saved':>8}{'dicts peak':>12}{'catalog peak':>14}")
+    for size, lists in results.items():
+        for name, stats in lists.items():
+            saved = 1 - stats['catalog_kib'] / stats['dicts_kib'] if stats['dicts_kib'] else 0.0
+            print(f"{size:>7}  {name:<10}{stats['dicts_kib']:>11.0f}{stats['catalog_kib']:>13.0f}{saved:>8.0%}"
+                  f"{stats['dicts_peak_kib']:>12.0f}{stats['catalog_peak_kib']:>14.0f}")
+        stored = lists['stored']
+        print(f"{'':>7}  name lookup: dict {stored['dicts_lookup_ns']:.0f} ns, catalog {stored['catalog_lookup_ns']:.0f} ns")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help="Comma-separated package counts")
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        results = run_worker(args.worker)
+        with open(args.json, 'w') as output:
+            json.dump(results, output)
+        return 0
+
+    results = {str(size): run_size(size) for size in (int(size) for size in args.sizes.split(','))}
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(results, output, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Local stand-in for Groq's OpenAI-compatible chat completions API.
+
+Answers POST /openai/v1/chat/completions (and /v1/chat/completions) with a
+fixed suggestion after a configurable delay, streamed as server-sent events
+when the request asks for it. Point snapshell at it with
+{"provider": "openai", "base_url": "http://127.0.0.1:8000/openai/v1"}.
+
+    python benchmarks/mock_llm.py [--port 8000] [--latency-ms 300]
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = {"command": "tar -czf archive.tar.gz folder/", "explanation": "Creates a gzip-compressed tar archive of folder/."}
+# Characters per streamed chunk and the pause between chunks
+CHUNK_SIZE = 8
+CHUNK_DELAY = 0.005
+
+
+class MockCompletionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        self.server.requests += 1
+        time.sleep(self.server.latency)
+
+        content = json.dumps(ANSWER)
+        prompt_tokens = sum(len(message["content"]) for message in request["messages"]) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                 "total_tokens": prompt_tokens + len(content) // 4}
+        if request.get("stream"):
+            self.stream(content, request["model"], usage)
+        else:
+            self.send_json({
+                "id": "chatcmpl-mock", "object": "chat.completion", "model": request["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+    def send_json(self, body):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def stream(self, content, model, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for start in range(0, len(content), CHUNK_SIZE):
+            self.send_event({"model": model, "choices": [{"index": 0, "delta": {"content": content[start:start + CHUNK_SIZE]}}]})
+            time.sleep(CHUNK_DELAY)
+        # Groq reports usage on the final chunk
+        self.send_event({"model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "x_groq": {"usage": usage}})
+        self.send_chunk(b"data: [DONE]\n\n")
+        self.send_chunk(b"")
+
+    def send_event(self, body):
+        self.send_chunk(f"data: {json.dumps(body)}\n\n".encode())
+
+    def send_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency_ms=0):
+        super().__init__(("127.0.0.1", port), MockCompletionHandler)
+        self.latency = latency_ms / 1000
+        self.requests = 0
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_port}/openai/v1"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="mock-llm", daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency-ms', type=float, default=300, help="Delay before each response starts")
+    args = parser.parse_args()
+
+    server = MockLLMServer(args.port, args.latency_ms)
+    print(f"Serving mock chat completions at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
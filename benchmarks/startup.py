@@ -0,0 +1,83 @@
+"""
+Startup-time guard for the light entry points.
+
+Runs each entry point in a fresh interpreter under ``python -X importtime``,
+reports the cumulative import time and fails if a heavy dependency sneaks
+back into a path that should not need it.
+
+    python benchmarks/startup.py [--max-ms 150] [--json results.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('groq', 'pydantic', 'tqdm', 'httpx', 'numpy')
+# The ask path talks to the daemon and needs neither an event loop nor the database
+ASK_HEAVY_MODULES = HEAVY_MODULES + ('asyncio', 'sqlite3', 'snapshell.utils', 'snapshell.backends')
+
+# What the `snapshell` console script runs (see setup.py), with the given arguments
+CONSOLE_SCRIPT = "import sys; sys.argv = ['snapshell', {args}]; from snapshell.cli import main; sys.exit(main())"
+
+# Entry point -> (code run in the child interpreter, modules it must not import)
+ENTRY_POINTS = {
+    'import snapshell': ('import snapshell', HEAVY_MODULES),
+    'history / maintenance': ('import snapshell.cli, snapshell.utils', HEAVY_MODULES),
+    'snapshell ask': (CONSOLE_SCRIPT.format(args="'ask', '--help'"), ASK_HEAVY_MODULES),
+}
+
+
+def import_profile(code):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    # Lines look like "import time:  self_us | cumulative_us | <indent>name",
+    # nested imports are indented two spaces per level
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        modules[name[1:].rstrip()] = int(cumulative_us)
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--max-ms', type=float, help="Fail if any entry point takes longer than this to import")
+    parser.add_argument('--json', help="Write the measurements to this file")
+    args = parser.parse_args()
+
+    failures = []
+    results = {}
+    for label, (code, forbidden) in ENTRY_POINTS.items():
+        modules = import_profile(code)
+        total_ms = sum(us for name, us in modules.items() if not name.startswith(' ')) / 1000
+        heavy = sorted(
+            name.strip() for name in modules
+            if name.strip() in forbidden or name.strip().split('.')[0] in forbidden
+        )
+        results[label] = {'import_ms': total_ms, 'modules': len(modules), 'heavy_modules': heavy}
+        print(f"{label:<24} {total_ms:8.1f} ms  {len(modules):4d} modules")
+
+        if heavy:
+            failures.append(f"{label} imports {', '.join(heavy)}")
+        if args.max_ms is not None and total_ms > args.max_ms:
+            failures.append(f"{label} took {total_ms:.1f} ms (limit {args.max_ms} ms)")
+
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(results, output, indent=2)
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+Benchmarks for package ingest, retrieval, prompt assembly and end-to-end latency.
+
+Each package count runs in a fresh interpreter with its own throwaway HOME,
+a synthetic package manager and a local mock of the chat completions API, so
+nothing touches the real database or network. Results can be saved as JSON
+and compared against a previous run, e.g. the parent commit.
+
+    python benchmarks/suite.py [--sizes 1000,10000,50000] [--suites ingest,retrieval,prompt,e2e]
+                               [--rounds 5] [--latency-ms 200] [--json out.json] [--compare base.json]
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+
+SUITES = ('ingest', 'retrieval', 'prompt', 'e2e')
+DEFAULT_SIZES = (1000, 10000, 50000)
+# Share of packages whose version changes between incremental ingest rounds
+CHANGED_SHARE = 0.01
+
+HISTORY = [
+    {"role": "user", "content": "how do I list files by size"},
+    {"role": "assistant", "content": "ls -lS"},
+    {"role": "user", "content": "only the largest ten"},
+    {"role": "assistant", "content": "ls -lS | head -n 10"},
+]
+
+
+def summarize(seconds):
+    ms = sorted(value * 1000 for value in seconds)
+    return {
+        'rounds': len(ms),
+        'min_ms': ms[0],
+        'median_ms': statistics.median(ms),
+        'mean_ms': statistics.fmean(ms),
+        'p95_ms': ms[min(len(ms) - 1, int(0.95 * len(ms)))],
+        'max_ms': ms[-1],
+        'stddev_ms': statistics.stdev(ms) if len(ms) > 1 else 0.0,
+    }
+
+
+def measure(function, rounds, setup=None):
+    seconds = []
+    for _ in range(rounds):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - start)
+    return summarize(seconds)
+
+
+@contextlib.contextmanager
+def quiet():
+    # update_database reports progress on stdout and tqdm on stderr
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        yield
+
+
+def run_worker(size, suites, rounds, latency_ms):
+    """
+    Runs inside the child interpreter; HOME already points at an empty directory.
+    """
+    from mock_llm import MockLLMServer
+    from synthetic import QUERIES, SyntheticPackageManager, generate_packages, write_dpkg_status, write_pacman_local
+    from snapshell import db, llm_api, utils
+    from snapshell.config import save_config
+    from snapshell.package_managers.readers import read_dpkg_status, read_pacman_local
+    from snapshell.search import search_packages
+
+    server = MockLLMServer(latency_ms=latency_ms).start()
+    # Hedged duplicates would hide the mock's latency
+    save_config({"provider": "openai", "base_url": server.base_url, "metrics": False, "completion_hedge_seconds": None})
+
+    packages = generate_packages(size)
+    manager = SyntheticPackageManager(packages)
+    utils.get_package_manager = llm_api.get_package_manager = lambda: manager
+    results = {}
+
+    def fresh_database():
+        db.close_connection()
+        for suffix in ('', '-wal', '-shm'):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(db.DB_PATH + suffix)
+        db._schema_checked = False
+
+    def bump_versions():
+        for package in packages[::int(1 / CHANGED_SHARE)]:
+            package['version'] += '+1'
+
+    with quiet():
+        if 'ingest' in suites:
+            results['ingest.full'] = measure(utils.update_database, rounds, setup=fresh_database)
+            results['ingest.incremental'] = measure(utils.update_database, rounds, setup=bump_versions)
+            results['ingest.unchanged'] = measure(utils.update_database, rounds)
+
+            fixtures = tempfile.mkdtemp(dir=os.environ['HOME'])
+            status_path = os.path.join(fixtures, 'status')
+            write_dpkg_status(status_path, packages)
+            write_pacman_local(os.path.join(fixtures, 'local'), packages)
+            results['parse.dpkg_status'] = measure(lambda: list(read_dpkg_status(status_path)), rounds)
+            results['parse.pacman_local'] = measure(lambda: list(read_pacman_local(os.path.join(fixtures, 'local'))), rounds)
+        elif not utils.has_packages():
+            utils.update_database()
+
+        if 'retrieval' in suites:
+            results['retrieval.search'] = measure_queries(lambda query: search_packages(query, llm_api.CANDIDATE_POOL), QUERIES, rounds)
+
+        client = llm_api.LLMClient()
+        client.init_client()
+        if 'prompt' in suites:
+            results['prompt.build'] = measure_queries(lambda query: client.build_messages(query, HISTORY), QUERIES, rounds)
+
+        if 'e2e' in suites:
+            results['e2e.suggest'] = measure_queries(
+                lambda query: client.suggest_command(query, [], use_cache=False), QUERIES, rounds)
+            results['e2e.suggest_stream'] = measure_queries(
+                lambda query: client.suggest_command(query, [], use_cache=False, on_field=lambda *_: None), QUERIES, rounds)
+            results['e2e.cache_hit'] = measure_queries(lambda query: client.suggest_command(query, []), QUERIES, rounds)
+            # Time spent outside the (mocked) API call
+            for name in ('e2e.suggest', 'e2e.suggest_stream'):
+                results[name]['overhead_median_ms'] = results[name]['median_ms'] - latency_ms
+
+    server.shutdown()
+    return results
+
+
+def measure_queries(function, queries, rounds):
+    seconds = []
+    for _ in range(rounds):
+        for query in queries:
+            start = time.perf_counter()
+            function(query)
+            seconds.append(time.perf_counter() - start)
+    return summarize(seconds)
+
+
+def run_size(size, suites, rounds, latency_ms):
+    with tempfile.TemporaryDirectory(prefix='snapshell-bench-') as home:
+        env = dict(os.environ, HOME=home, PYTHONPATH=os.pathsep.join([REPO_ROOT, BENCHMARK_DIR]))
+        output = os.path.join(home, 'results.json')
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', str(size), '--suites', ','.join(suites),
+             '--rounds', str(rounds), '--latency-ms', str(latency_ms), '--json', output],
+            env=env, check=True,
+        )
+        with open(output) as results_file:
+            return json.load(results_file)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    header = f"{'size':>7}  {'benchmark':<24}{'median ms':>11}{'p95 ms':>10}"
+    print(header + (f"{'base ms':>10}{'change':>9}" if baseline else ''))
+    for size, benchmarks in results.items():
+        for name, stats in benchmarks.items():
+            line = f"{size:>7}  {name:<24}{stats['median_ms']:>11.2f}{stats['p95_ms']:>10.2f}"
+            base = (baseline or {}).get(size, {}).get(name)
+            if base:
+                change = stats['median_ms'] / base['median_ms'] - 1 if base['median_ms'] else 0.0
+                line += f"{base['median_ms']:>10.2f}{change:>+9.1%}"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help="Comma-separated package counts")
+    parser.add_argument('--suites', default=','.join(SUITES), help=f"Comma-separated subset of {', '.join(SUITES)}")
+    parser.add_argument('--rounds', type=int, default=5, help="Repetitions per benchmark (per query for query suites)")
+    parser.add_argument('--latency-ms', type=float, default=200, help="Delay the mock LLM adds to every response")
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--compare', help="Results file from an earlier run to compare medians against")
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    suites = [suite for suite in args.suites.split(',') if suite]
+
+    if args.worker:
+        results = run_worker(args.worker, suites, args.rounds, args.latency_ms)
+        with open(args.json, 'w') as output:
+            json.dump(results, output)
+        return 0
+
+    results = {}
+    for size in (int(size) for size in args.sizes.split(',')):
+        results[str(size)] = run_size(size, suites, args.rounds, args.latency_ms)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+    print_results(results, baseline)
+
+    if args.json:
+        document = {
+            'meta': {
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'rounds': args.rounds,
+                'latency_ms': args.latency_ms,
+            },
+            'results': results,
+        }
+        with open(args.json, 'w') as output:
+            json.dump(document, output, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
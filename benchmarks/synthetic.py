@@ -0,0 +1,98 @@
+"""
+Deterministic synthetic package sets for the benchmarks: an in-memory package
+manager plus dpkg status and pacman local fixtures built from the same data.
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snapshell.package_managers.base_package_manager import BasePackageManager
+
+STEMS = (
+    'zip', 'tar', 'xz', 'zstd', 'curl', 'wget', 'ssl', 'ssh', 'git', 'grep', 'sed', 'awk', 'find',
+    'rsync', 'nginx', 'docker', 'python', 'perl', 'ruby', 'node', 'gtk', 'qt', 'x11', 'mesa',
+    'sqlite', 'postgres', 'redis', 'ffmpeg', 'image', 'font', 'audio', 'video', 'net', 'disk',
+    'usb', 'bluetooth', 'printer', 'cron', 'systemd', 'kernel', 'vim', 'emacs', 'shell', 'json',
+)
+PREFIXES = ('', '', '', 'lib', 'lib', 'python3-', 'ruby-', 'node-', 'golang-')
+SUFFIXES = ('', '', '', '-utils', '-dev', '-common', '-data', '-tools', '-doc', '1')
+NOUNS = (
+    'archive', 'compression', 'network', 'transfer', 'encryption', 'image', 'audio', 'video', 'disk',
+    'filesystem', 'process', 'terminal', 'text', 'database', 'web server', 'container', 'font',
+    'printer', 'kernel module', 'package', 'library', 'shell', 'editor', 'scheduler', 'log',
+)
+VERBS = (
+    'manipulation', 'management', 'monitoring', 'conversion', 'inspection', 'development',
+    'runtime', 'bindings', 'utilities', 'documentation', 'support', 'tools',
+)
+QUERIES = (
+    'compress a folder into an archive',
+    'find files larger than 100MB',
+    'show disk usage per directory',
+    'download a file over https',
+    'restart the web server',
+    'list running containers',
+    'convert a video to mp4',
+    'search text recursively in files',
+    'copy files to a remote machine',
+    'show open network ports',
+)
+
+
+def generate_packages(count, seed=0):
+    """
+    Return `count` package dicts shaped like BasePackageManager output. Dependencies
+    favour early packages, giving a few hub libraries like real systems have.
+    """
+    rng = random.Random(seed)
+    packages = []
+    for index in range(count):
+        name = f"{rng.choice(PREFIXES)}{rng.choice(STEMS)}{rng.choice(SUFFIXES)}-{index}"
+        depends = sorted({
+            packages[min(index - 1, int(rng.paretovariate(1.2)) - 1)]['name']
+            for _ in range(rng.randint(0, 6)) if index
+        })
+        packages.append({
+            'name': name,
+            'version': f"{rng.randint(0, 9)}.{rng.randint(0, 40)}.{rng.randint(0, 20)}-{rng.randint(1, 5)}",
+            'description': f"{rng.choice(NOUNS)} {rng.choice(VERBS)} for {rng.choice(NOUNS)} {rng.choice(VERBS)}",
+            'depends_on': depends,
+        })
+    return packages
+
+
+class SyntheticPackageManager(BasePackageManager):
+    # No state_paths, so every update diffs against the database
+    def __init__(self, packages):
+        self.packages = packages
+
+    def query_installed_packages(self):
+        return self.packages
+
+
+def write_dpkg_status(path, packages):
+    with open(path, 'w') as status_file:
+        for package in packages:
+            status_file.write(
+                f"Package: {package['name']}\n"
+                "Status: install ok installed\n"
+                f"Version: {package['version']}\n"
+                f"Depends: {', '.join(package['depends_on'])}\n"
+                f"Description: {package['description']}\n"
+                " Extended description that the reader skips.\n"
+                " .\n"
+                " Second paragraph.\n\n"
+            )
+
+
+def write_pacman_local(path, packages):
+    for package in packages:
+        package_dir = os.path.join(path, f"{package['name']}-{package['version']}")
+        os.makedirs(package_dir, exist_ok=True)
+        with open(os.path.join(package_dir, 'desc'), 'w') as desc_file:
+            desc_file.write(f"%NAME%\n{package['name']}\n\n%VERSION%\n{package['version']}\n\n")
+            desc_file.write(f"%DESC%\n{package['description']}\n\n")
+            if package['depends_on']:
+                desc_file.write("%DEPENDS%\n" + "\n".join(package['depends_on']) + "\n\n")
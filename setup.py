@@ -12,12 +12,15 @@ setup(
     packages=find_packages(),
     include_package_data=True,
     install_requires=[
-        'groq',
+        'httpx',
         'requests',
         'instructor',
         'pydantic',
         'tqdm',  
     ],
+    extras_require={
+        'semantic': ['numpy'],
+    },
     entry_points={
         'console_scripts': [
             'snapshell=snapshell.cli:main',
@@ -1,12 +1,36 @@
 # snapshell/__init__.py
-from .cli import main
-from .llm_api import LLMClient
-from .utils import create_database, update_database, save_command_suggestion, fetch_system_info ,print_color , view_history, clear_history
-from .package_managers import detect_package_manager
+import importlib
+
+# Submodules are imported on first attribute access so that light commands
+# (history, maintenance, the daemon client) never load groq, pydantic or tqdm
+_EXPORTS = {
+    'main': 'cli',
+    'LLMClient': 'llm_api',
+    'create_database': 'utils',
+    'update_database': 'utils',
+    'save_command_suggestion': 'utils',
+    'fetch_system_info': 'utils',
+    'print_color': 'utils',
+    'view_history': 'utils',
+    'clear_history': 'utils',
+    'detect_package_manager': 'package_managers',
+    'PackageCatalog': 'catalog',
+    'get_catalog': 'catalog',
+}
 
 __all__ = [
     'main', 'LLMClient',
     'create_database', 'update_database', 'save_command_suggestion',
     'fetch_system_info', 'detect_package_manager', 'print_color', 
-    'view_history', 'clear_history'
-]
\ No newline at end of file
+    'view_history', 'clear_history', 'PackageCatalog', 'get_catalog'
+]
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
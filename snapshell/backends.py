@@ -0,0 +1,278 @@
+# backends.py
+import asyncio
+import json
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+
+# Seconds for a whole request; connecting gets its own shorter limit
+REQUEST_TIMEOUT = 30.0
+CONNECT_TIMEOUT = 5.0
+MAX_RETRIES = 4
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_CAP_SECONDS = 20.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Which model each kind of call goes to, overridable with "models" in the config
+DEFAULT_MODELS = {
+    "suggest": "llama-3.3-70b-versatile",
+    "analyze": "llama-3.1-8b-instant",
+}
+
+Completion = namedtuple("Completion", "content usage")
+
+
+class BackendError(RuntimeError):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+async def aclose_quietly(client):
+    try:
+        await client.aclose()
+    except Exception:
+        # Its event loop is gone, the sockets were closed with it
+        pass
+
+
+def retry_delay(attempt, retry_after=None):
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        # Full jitter exponential backoff
+        return random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+class ChatBackend(ABC):
+    """
+    A chat-completions provider. complete() returns a Completion, stream()
+    yields content deltas and acomplete() is the asyncio variant of complete().
+    """
+
+    # time.monotonic() until which a retry is waiting out a 429 or an outage
+    backoff_until = 0.0
+
+    @abstractmethod
+    def complete(self, messages, model, json_mode=True):
+        pass
+
+    @abstractmethod
+    def stream(self, messages, model, usage=None):
+        pass
+
+    async def acomplete(self, messages, model, json_mode=True):
+        # Providers without a native async client run in a worker thread
+        return await asyncio.to_thread(self.complete, messages, model, json_mode)
+
+    def backoff(self, delay):
+        # Recorded so callers don't add requests while the provider asks us to slow down
+        self.backoff_until = max(self.backoff_until, time.monotonic() + delay)
+        return delay
+
+    def in_backoff(self):
+        return time.monotonic() < self.backoff_until
+
+    def close(self):
+        pass
+
+
+class OpenAICompatibleBackend(ChatBackend):
+    """
+    Any /chat/completions endpoint speaking the OpenAI wire format. One pooled
+    keep-alive HTTP client is shared by every call made through the backend.
+    """
+
+    def __init__(self, api_key, base_url, timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES):
+        import httpx
+
+        self.httpx = httpx
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.timeout = httpx.Timeout(timeout, connect=CONNECT_TIMEOUT)
+        self.limits = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60)
+        self.max_retries = max_retries
+        self.client = httpx.Client(headers=self.headers, timeout=self.timeout, limits=self.limits)
+        self.async_clients = {}
+        # aclose() tasks of replaced async clients, referenced until they finish
+        self.closing = set()
+        self.lock = threading.Lock()
+
+    def payload(self, messages, model, json_mode, stream=False):
+        body = {"model": model, "messages": messages, "temperature": 0, "stream": stream}
+        if json_mode:
+            body["response_format"] = {"type": "json_object"}
+        return body
+
+    def parse(self, response):
+        data = response.json()
+        return Completion(data["choices"][0]["message"]["content"], data.get("usage") or {})
+
+    def should_retry(self, attempt, response=None):
+        return attempt < self.max_retries and (response is None or response.status_code in RETRY_STATUSES)
+
+    def raise_for_status(self, response):
+        if response.status_code >= 400:
+            raise BackendError(f"{self.url} returned {response.status_code}: {response.text[:200]}", response.status_code)
+
+    def complete(self, messages, model, json_mode=True):
+        body = self.payload(messages, model, json_mode)
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.client.post(self.url, json=body)
+            except self.httpx.TransportError as e:
+                if not self.should_retry(attempt):
+                    raise BackendError(f"Request to {self.url} failed: {e}") from e
+                time.sleep(self.backoff(retry_delay(attempt)))
+                continue
+            if response.status_code < 400 or not self.should_retry(attempt, response):
+                self.raise_for_status(response)
+                return self.parse(response)
+            time.sleep(self.backoff(retry_delay(attempt, response.headers.get("retry-after"))))
+
+    def stream(self, messages, model, usage=None):
+        # JSON mode can't be combined with streaming, callers ask for JSON in the prompt
+        body = self.payload(messages, model, json_mode=False, stream=True)
+        for attempt in range(self.max_retries + 1):
+            yielded = False
+            try:
+                with self.client.stream("POST", self.url, json=body) as response:
+                    if response.status_code >= 400 and self.should_retry(attempt, response):
+                        delay = self.backoff(retry_delay(attempt, response.headers.get("retry-after")))
+                    else:
+                        if response.status_code >= 400:
+                            response.read()
+                        self.raise_for_status(response)
+                        for delta in self.iter_deltas(response, usage):
+                            yielded = True
+                            yield delta
+                        return
+            except self.httpx.TransportError as e:
+                # Only retry when nothing has been yielded yet, a new request would repeat it
+                if yielded:
+                    raise BackendError(f"Stream from {self.url} was interrupted: {e}") from e
+                if not self.should_retry(attempt):
+                    raise BackendError(f"Request to {self.url} failed: {e}") from e
+                delay = self.backoff(retry_delay(attempt))
+            time.sleep(delay)
+
+    def iter_deltas(self, response, usage=None):
+        # Server-sent events: "data: {...}" lines, terminated by "data: [DONE]"
+        for line in response.iter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                return
+            chunk = json.loads(data)
+            # Groq reports usage on the last chunk under x_groq, OpenAI-style servers at the top level
+            chunk_usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage")
+            if usage is not None and chunk_usage:
+                usage.update(chunk_usage)
+            choices = chunk.get("choices") or []
+            delta = choices[0].get("delta", {}).get("content") if choices else None
+            if delta:
+                yield delta
+
+    def async_client(self):
+        # AsyncClient is bound to the event loop it was first used on
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            client = self.async_clients.get(loop)
+            if client is None:
+                self.close_async_clients(loop)
+                client = self.httpx.AsyncClient(headers=self.headers, timeout=self.timeout, limits=self.limits)
+                self.async_clients[loop] = client
+        return client
+
+    def close_async_clients(self, current_loop=None):
+        # Close pooled connections on the client's own loop while it runs, otherwise on the
+        # current loop (or a short-lived one when called from close())
+        for loop, client in self.async_clients.items():
+            if loop.is_running() and loop is not current_loop:
+                asyncio.run_coroutine_threadsafe(aclose_quietly(client), loop)
+            elif current_loop is not None:
+                task = current_loop.create_task(aclose_quietly(client))
+                self.closing.add(task)
+                task.add_done_callback(self.closing.discard)
+            elif not loop.is_running():
+                asyncio.run(aclose_quietly(client))
+        self.async_clients.clear()
+
+    async def acomplete(self, messages, model, json_mode=True):
+        body = self.payload(messages, model, json_mode)
+        client = self.async_client()
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await client.post(self.url, json=body)
+            except self.httpx.TransportError as e:
+                if not self.should_retry(attempt):
+                    raise BackendError(f"Request to {self.url} failed: {e}") from e
+                await asyncio.sleep(self.backoff(retry_delay(attempt)))
+                continue
+            if response.status_code < 400 or not self.should_retry(attempt, response):
+                self.raise_for_status(response)
+                return self.parse(response)
+            await asyncio.sleep(self.backoff(retry_delay(attempt, response.headers.get("retry-after"))))
+
+    def close(self):
+        self.client.close()
+        with self.lock:
+            self.close_async_clients()
+
+
+class GroqBackend(OpenAICompatibleBackend):
+    def __init__(self, api_key, base_url=GROQ_BASE_URL, **kwargs):
+        super().__init__(api_key, base_url, **kwargs)
+
+
+class StubBackend(ChatBackend):
+    """
+    Offline backend for tests and demos: echoes the last user message back as a
+    command after an optional artificial latency.
+    """
+
+    def __init__(self, latency=0.0, responses=None):
+        self.latency = latency
+        self.responses = responses or {}
+
+    def answer(self, messages):
+        query = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        answer = self.responses.get(query, {"command": f"echo {json.dumps(query)}", "explanation": "Stub backend response."})
+        return json.dumps(answer)
+
+    def complete(self, messages, model, json_mode=True):
+        time.sleep(self.latency)
+        return Completion(self.answer(messages), {})
+
+    def stream(self, messages, model, usage=None):
+        time.sleep(self.latency)
+        content = self.answer(messages)
+        for start in range(0, len(content), 8):
+            yield content[start:start + 8]
+
+    async def acomplete(self, messages, model, json_mode=True):
+        await asyncio.sleep(self.latency)
+        return Completion(self.answer(messages), {})
+
+
+def create_backend(config, api_key):
+    """
+    Build the backend named by config["provider"]: "groq" (default), "openai"
+    for any OpenAI-compatible endpoint at config["base_url"], or "stub".
+    """
+    provider = config.get("provider", "groq")
+    options = {key: config[key] for key in ("timeout", "max_retries") if key in config}
+    if provider == "groq":
+        return GroqBackend(api_key, config.get("base_url", GROQ_BASE_URL), **options)
+    if provider == "openai":
+        if "base_url" not in config:
+            raise ValueError('The "openai" provider needs a "base_url" in the config file.')
+        return OpenAICompatibleBackend(config.get("api_key", api_key), config["base_url"], **options)
+    if provider == "stub":
+        return StubBackend(latency=config.get("stub_latency", 0.0))
+    raise ValueError(f"Unknown provider {provider!r}")
@@ -0,0 +1,46 @@
+# batch.py
+import asyncio
+import json
+import sys
+
+DEFAULT_CONCURRENCY = 4
+
+
+def read_queries(source):
+    for line in source:
+        query = line.strip()
+        if query:
+            yield query
+
+
+async def answer_queries(llm_client, queries, concurrency=DEFAULT_CONCURRENCY, use_cache=True):
+    """
+    Answer queries concurrently, at most `concurrency` requests in flight, and
+    yield one result dict per query in input order as soon as it is ready.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def answer(query):
+        async with semaphore:
+            try:
+                suggestion = await llm_client.asuggest_command(query, use_cache=use_cache)
+            except Exception as e:
+                return {"query": query, "error": str(e)}
+        return {"query": query, "command": suggestion.command, "explanation": suggestion.explanation}
+
+    tasks = [asyncio.create_task(answer(query)) for query in queries]
+    for task in tasks:
+        yield await task
+
+
+def run_batch(llm_client, source, output=sys.stdout, concurrency=DEFAULT_CONCURRENCY, use_cache=True):
+    # Emits JSON Lines; returns the number of queries that failed
+    async def run():
+        failed = 0
+        async for result in answer_queries(llm_client, read_queries(source), concurrency, use_cache):
+            failed += "error" in result
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+        return failed
+
+    return asyncio.run(run())
@@ -0,0 +1,70 @@
+# cache.py
+import hashlib
+import json
+import re
+import time
+from .db import get_connection, get_metadata
+from .search import STOPWORDS
+
+# Entries older than this are treated as misses
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+# Least recently used entries beyond this count are evicted
+CACHE_MAX_ENTRIES = 1000
+
+WORD_RE = re.compile(r"[^\s?!,;\"']+")
+
+
+def normalize_query(user_input):
+    words = [word.rstrip('.') for word in WORD_RE.findall(user_input.lower())]
+    return " ".join(word for word in words if word and word not in STOPWORDS)
+
+
+def cache_key(user_input, model_name, conversation_history, scope=""):
+    """
+    Key on the normalized query, the model, the installed-package fingerprint, the
+    host scope and the preceding conversation, so follow-up questions never hit an
+    answer given in another context.
+    """
+    fingerprint = get_metadata(get_connection(), "package_fingerprint") or ""
+
+    context = json.dumps(conversation_history, sort_keys=True)
+    raw = "\0".join([normalize_query(user_input), model_name, fingerprint, context])
+    if scope:
+        raw += "\0" + scope
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get_cached_suggestion(key, ttl=CACHE_TTL_SECONDS):
+    now = time.time()
+    conn = get_connection()
+    row = conn.execute(
+        "SELECT command, explanation FROM suggestion_cache WHERE key = ? AND created_at >= ?",
+        (key, now - ttl),
+    ).fetchone()
+    if row is None:
+        return None
+
+    with conn:
+        conn.execute("UPDATE suggestion_cache SET last_used = ? WHERE key = ?", (now, key))
+    return {"command": row[0], "explanation": row[1]}
+
+
+def store_cached_suggestion(key, command, explanation, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+    now = time.time()
+    conn = get_connection()
+    with conn:
+        conn.execute('''
+            INSERT INTO suggestion_cache (key, command, explanation, created_at, last_used)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                command = excluded.command,
+                explanation = excluded.explanation,
+                created_at = excluded.created_at,
+                last_used = excluded.last_used
+        ''', (key, command, explanation, now, now))
+        conn.execute("DELETE FROM suggestion_cache WHERE created_at < ?", (now - ttl,))
+        conn.execute('''
+            DELETE FROM suggestion_cache WHERE key IN (
+                SELECT key FROM suggestion_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        ''', (max_entries,))
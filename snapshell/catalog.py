@@ -0,0 +1,116 @@
+# catalog.py
+# Compact read-only view of the installed packages for long-lived processes (daemon,
+# REPL). Names and versions are held in parallel lists instead of one dict per package;
+# descriptions, the bulk of the text, stay in SQLite until somebody asks for one.
+import bisect
+import sys
+import threading
+from .db import get_connection, get_metadata
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+class Package:
+    # Lightweight view of one catalog row, created on access
+    __slots__ = ("catalog", "index")
+
+    def __init__(self, catalog, index):
+        self.catalog = catalog
+        self.index = index
+
+    @property
+    def name(self):
+        return self.catalog.names[self.index]
+
+    @property
+    def version(self):
+        return self.catalog.versions[self.index]
+
+    @property
+    def description(self):
+        return self.catalog.description(self.name)
+
+    def __getitem__(self, key):
+        # Reads like the package dicts used elsewhere, pkg["name"]
+        if key not in ("name", "version", "description"):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return f"Package({self.name!r}, {self.version!r})"
+
+
+class PackageCatalog:
+    """
+    Installed packages as sorted, interned name and version columns with a
+    name -> row dict. Descriptions are read from system_config on demand.
+    """
+
+    __slots__ = ("names", "versions", "positions", "generation")
+
+    def __init__(self, rows, generation=None):
+        # rows are (name, version) pairs sorted by name, read in one pass so a cursor works
+        self.names, self.versions = [], []
+        # Many packages share a version string, keep one copy of each
+        shared = {}
+        for name, version in rows:
+            self.names.append(sys.intern(name))
+            self.versions.append(shared.setdefault(version, version))
+        self.positions = {name: index for index, name in enumerate(self.names)}
+        self.generation = generation
+
+    @classmethod
+    def from_database(cls, conn=None):
+        conn = conn or get_connection()
+        generation = get_metadata(conn, "packages_generation")
+        rows = conn.execute("SELECT tool_name, version FROM system_config ORDER BY tool_name")
+        return cls(rows, generation=generation)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.positions
+
+    def __iter__(self):
+        return (Package(self, index) for index in range(len(self.names)))
+
+    def get(self, name):
+        index = self.positions.get(name)
+        return None if index is None else Package(self, index)
+
+    def version(self, name):
+        index = self.positions.get(name)
+        return None if index is None else self.versions[index]
+
+    def with_prefix(self, prefix, limit=None):
+        # Names are sorted, so every match sits in one contiguous run
+        start = bisect.bisect_left(self.names, prefix)
+        end = bisect.bisect_left(self.names, prefix + "\U0010ffff", start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.names[start:end]
+
+    def description(self, name):
+        row = get_connection().execute("SELECT description FROM system_config WHERE tool_name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+
+def get_catalog():
+    """
+    The process-wide catalog of stored packages, reloaded only after
+    update_database has changed them (in this or another process).
+    """
+    global _catalog
+    generation = get_metadata(get_connection(), "packages_generation")
+    with _catalog_lock:
+        if _catalog is None or _catalog.generation != generation:
+            _catalog = PackageCatalog.from_database()
+        return _catalog
@@ -1,9 +1,18 @@
 import argparse
-import sqlite3
-from snapshell.utils import update_database, DB_PATH, print_color , clear_history, view_history
-from .llm_api import LLMClient
+import json
+import os
+import sys
+import time
+# Only light modules at the top, `snapshell ask` must start as fast as the thin client
+from .colors import RESET, get_color, print_color
+from .config import load_api_key, load_config, save_api_key
+
+# Messages kept in the REPL; what reaches the prompt is trimmed to the token budget
+MAX_HISTORY_MESSAGES = 64
 
 def initial_setup(llm_client):
+    from .db import DB_PATH
+
     # Prompt user for GROQ API key
     print_color("Please enter your GROQ API key:", "GREEN")
     groq_api_key = input("> " )
@@ -18,45 +27,297 @@ def initial_setup(llm_client):
     
 
 
+class SuggestionPrinter:
+    # Renders streamed fields: the command once it is complete, the explanation as it arrives
+    def __init__(self):
+        self.command = []
+        self.printed_command = False
+        self.printed_explanation = False
+
+    def __call__(self, field, text, done):
+        if field == "command":
+            self.command.append(text)
+            if done:
+                print_color("Suggested Command:", "GREEN")
+                print_color("".join(self.command), "WHITE")
+                self.printed_command = True
+        elif field == "explanation":
+            if not self.printed_explanation:
+                print_color("Explanation: \n", "BLUE")
+                self.printed_explanation = True
+            sys.stdout.write(f"{get_color('BLUE')}{text}{RESET}")
+            if done:
+                sys.stdout.write("\n")
+            sys.stdout.flush()
+
+
+def prune_configured_history():
+    from .db import get_connection
+    from .history import history_writer, prune_history
+
+    config = load_config()
+    max_rows, max_age_days = config.get("history_max_rows"), config.get("history_max_age_days")
+    if not (max_rows or max_age_days):
+        print_color("Set history_max_rows and/or history_max_age_days in the config file to prune history.", "YELLOW")
+        return
+    history_writer.flush()
+    removed = prune_history(get_connection(), max_rows, max_age_days, full_vacuum=True)
+    print_color(f"Removed {removed} history entries.", "GREEN")
+
+
+def start_client(llm_client, host=None):
+    llm_client.init_client()
+    if host:
+        try:
+            llm_client.set_host(host)
+        except ValueError as e:
+            print_color(str(e), "RED")
+            sys.exit(1)
+
+
+def import_inventories(paths, host=None):
+    from .inventory import import_snapshot, read_snapshot
+
+    if host and len(paths) > 1:
+        print_color("--host names a single host, import several snapshots without it.", "RED")
+        sys.exit(1)
+    for path in paths:
+        name, package_manager, packages = read_snapshot(path, host)
+        count = import_snapshot(name, package_manager, packages, source=os.path.abspath(path))
+        print_color(f"Imported {count} packages for {name}.", "GREEN")
+
+
+def print_hosts():
+    from .inventory import list_hosts
+
+    hosts = list_hosts()
+    if not hosts:
+        print_color("No host inventories imported.", "YELLOW")
+        return
+    for name, package_manager, package_count, imported_at, _ in hosts:
+        imported = time.strftime("%Y-%m-%d %H:%M", time.localtime(imported_at))
+        print(f"{name:<32} {package_manager or '?':<8} {package_count:>7} packages  imported {imported}")
+
+
+def print_sessions():
+    from .sessions import list_sessions
+
+    sessions = list_sessions()
+    if not sessions:
+        print_color("No sessions yet. Start one with --session NAME.", "YELLOW")
+        return
+    for name, updated_at, turns in sessions:
+        updated = time.strftime("%Y-%m-%d %H:%M", time.localtime(updated_at))
+        print(f"{name:<32} {turns:>6} turns  last used {updated}")
+
+
+def open_session(llm_client, name):
+    from .sessions import Session
+
+    session = Session.open(name)
+    llm_client.session_id = session.id
+    return session
+
+
+def print_suggestion(suggestion):
+    print_color("Suggested Command:", "GREEN")
+    print_color(suggestion.command, "WHITE")
+    print_color("Explanation: \n", "BLUE")
+    print_color(suggestion.explanation, "BLUE")
+
+
+def warn_problems(command):
+    from .validate import validate_command
+
+    for problem in validate_command(command):
+        print_color(f"Check failed: {problem}", "YELLOW")
+
+
 def main():
+    # The thin client must not pay for the LLM stack
+    if sys.argv[1:2] == ['ask']:
+        from .client import main as ask_main
+        sys.exit(ask_main(sys.argv[2:]))
+    if sys.argv[1:2] in (['deps'], ['rdeps']):
+        from .deps import main as deps_main
+        sys.exit(deps_main(sys.argv[2:], reverse=sys.argv[1] == 'rdeps'))
+
+    from .backends import BackendError
+    from .utils import clear_history, update_database, view_history
+
     parser = argparse.ArgumentParser(description="Auto-complete Linux commands using an LLM.")
     parser.add_argument('--update-db', action='store_true', help="Update the database with installed packages")
+    parser.add_argument('--rebuild-db', action='store_true', help="Resync every installed package, even if nothing changed")
     parser.add_argument('--view-history', action='store_true', help="View command history")
     parser.add_argument('--clear-history', action='store_true', help="Clear command history")
+    parser.add_argument('--history-search', type=str, metavar='QUERY', help="Show history entries whose query or command match QUERY")
+    parser.add_argument('--history-limit', type=int, metavar='N', help="Show or export at most N history entries")
+    parser.add_argument('--export-history', type=str, metavar='FILE', help="Write history to FILE ('-' for stdout) as JSON Lines or CSV")
+    parser.add_argument('--export-format', choices=('jsonl', 'csv'), help="Format for --export-history, defaults to the FILE extension")
+    parser.add_argument('--prune-history', action='store_true', help="Apply the configured history retention now and reclaim disk space")
+    parser.add_argument('--no-cache', action='store_true', help="Always ask the LLM instead of reusing cached suggestions")
+    parser.add_argument('--no-fast-path', action='store_true', help="Always ask the LLM instead of answering common queries from local templates")
+    parser.add_argument('--no-validate', action='store_true', help="Show suggestions without checking their programs and options locally")
+    parser.add_argument('--no-stream', action='store_true', help="Print the suggestion only once the full response has arrived")
+    parser.add_argument('--daemon', action='store_true', help="Keep a warm client running and answer `snapshell ask` over a Unix socket")
+    parser.add_argument('-q', '--query', type=str, help="Answer a single query and exit")
+    parser.add_argument('--batch', type=str, metavar='FILE', help="Answer one query per line from FILE ('-' for stdin) as JSON Lines")
+    parser.add_argument('--concurrency', type=int, default=4, help="Maximum concurrent LLM requests in batch mode")
+    parser.add_argument('--json', action='store_true', help="Print the one-shot answer as JSON instead of the bare command")
+    parser.add_argument('--context-budget', type=int, help="Token budget for packages and history in each prompt")
+    parser.add_argument('--stats', action='store_true', help="Show p50/p95/p99 latency per stage, cache hits, token usage and fallbacks")
+    parser.add_argument('--export-metrics', type=str, metavar='FILE', help="Write recorded spans as OpenTelemetry JSON to FILE ('-' for stdout)")
+    parser.add_argument('--export-inventory', type=str, metavar='FILE', help="Write this machine's packages as a JSON snapshot to FILE ('-' for stdout)")
+    parser.add_argument('--import-inventory', type=str, nargs='+', metavar='PATH', help="Import package snapshots (inventory JSON, dpkg status, pacman local dir or `pacman -Q` output)")
+    parser.add_argument('--list-hosts', action='store_true', help="List hosts with imported inventories")
+    parser.add_argument('--remove-host', type=str, metavar='NAME', help="Delete a host's imported inventory")
+    parser.add_argument('--host', type=str, help="Answer for an imported host ('*' for all imported hosts); names the host when importing or exporting")
+    parser.add_argument('--session', type=str, metavar='NAME', help="Continue the named conversation, creating it if needed; it is saved between runs")
+    parser.add_argument('--list-sessions', action='store_true', help="List saved sessions")
+    parser.add_argument('--delete-session', type=str, metavar='NAME', help="Forget a saved session (its entries stay in the history)")
     parser.add_argument('--set-api-key', type=str, help="Set the GROQ API key")
     args = parser.parse_args()
 
-    llm_client = LLMClient()
-
     if args.set_api_key:
-        llm_client.set_api_key(args.set_api_key)
+        save_api_key(args.set_api_key)
         print_color("API key set successfully.", "GREEN")
         return
 
     # Load the API key from the configuration file
-    API_KEY = llm_client.load_api_key()
+    API_KEY = load_api_key()
 
-    if not API_KEY:
-        initial_setup(llm_client)
+    if not API_KEY and load_config().get("provider", "groq") == "groq":
+        # Deferred so history and maintenance commands never import the LLM stack
+        from .llm_api import LLMClient
+        initial_setup(LLMClient())
     
-    if args.update_db:
-        print_color("Updating database...", "YELLOW")
-        update_database()
-        print_color("Database updated successfully.", "GREEN")
+    if args.update_db or args.rebuild_db:
+        update_database(force=args.rebuild_db)
 
-    if args.view_history:
-        view_history()
+    if args.export_history:
+        from .history import export_history
+        fmt = args.export_format or ('csv' if args.export_history.endswith('.csv') else 'jsonl')
+        if args.export_history == '-':
+            export_history(sys.stdout, fmt, args.history_search, args.history_limit)
+        else:
+            with open(args.export_history, 'w', newline='') as export_file:
+                count = export_history(export_file, fmt, args.history_search, args.history_limit)
+            print_color(f"Exported {count} history entries to {args.export_history}.", "GREEN")
+        return
+
+    if args.view_history or args.history_search:
+        view_history(args.history_search, args.history_limit)
+        return
+
+    if args.prune_history:
+        prune_configured_history()
         return
 
     if args.clear_history:
         clear_history()
         return
+
+    if args.export_inventory:
+        from .inventory import export_inventory
+        if args.export_inventory == '-':
+            export_inventory(sys.stdout, args.host)
+        else:
+            with open(args.export_inventory, 'w') as export_file:
+                count = export_inventory(export_file, args.host)
+            print_color(f"Exported {count} packages to {args.export_inventory}.", "GREEN")
+        return
+
+    if args.import_inventory:
+        import_inventories(args.import_inventory, args.host)
+        return
+
+    if args.list_hosts:
+        print_hosts()
+        return
+
+    if args.remove_host:
+        from .inventory import remove_host
+        if remove_host(args.remove_host):
+            print_color(f"Removed {args.remove_host}.", "GREEN")
+        else:
+            print_color(f"Unknown host {args.remove_host}.", "YELLOW")
+        return
+
+    if args.list_sessions:
+        print_sessions()
+        return
+
+    if args.delete_session:
+        from .sessions import delete_session
+        if delete_session(args.delete_session):
+            print_color(f"Deleted session {args.delete_session}.", "GREEN")
+        else:
+            print_color(f"Unknown session {args.delete_session}.", "YELLOW")
+        return
+
+    if args.stats:
+        from .metrics import print_stats
+        print_stats()
+        return
+
+    if args.export_metrics:
+        from .metrics import export_otel
+        if args.export_metrics == '-':
+            export_otel(sys.stdout)
+        else:
+            with open(args.export_metrics, 'w') as export_file:
+                export_otel(export_file)
+        return
     
+    from .llm_api import LLMClient
+    llm_client = LLMClient()
+    if args.context_budget:
+        llm_client.context_budget = args.context_budget
+    if args.no_validate:
+        llm_client.validate = False
+    if args.no_fast_path:
+        llm_client.fast_path = False
+
+    if args.daemon:
+        from .daemon import serve
+        start_client(llm_client, args.host)
+        serve(llm_client)
+        return
+
+    if args.query:
+        start_client(llm_client, args.host)
+        session = open_session(llm_client, args.session) if args.session else None
+        history = session.messages() if session else []
+        suggestion = llm_client.suggest_command(args.query, history, use_cache=not args.no_cache)
+        if session:
+            session.add_turn(args.query, suggestion.command)
+        if args.json:
+            print(json.dumps({"command": suggestion.command, "explanation": suggestion.explanation}))
+        else:
+            print(suggestion.command)
+        return
+
+    if args.batch:
+        from .batch import run_batch
+        start_client(llm_client, args.host)
+        if args.batch == '-':
+            failed = run_batch(llm_client, sys.stdin, concurrency=args.concurrency, use_cache=not args.no_cache)
+        else:
+            with open(args.batch) as batch_file:
+                failed = run_batch(llm_client, batch_file, concurrency=args.concurrency, use_cache=not args.no_cache)
+        sys.exit(1 if failed else 0)
+
     print_color("Welcome to the SnapShell. Type 'exit' to quit.", "CYAN")
     
-    llm_client.init_client()
+    start_client(llm_client, args.host)
     
     conversation_history = []
+    session = None
+    if args.session:
+        session = open_session(llm_client, args.session)
+        conversation_history = session.messages()
+        if session.turns:
+            print_color(f"Resumed session {session.name}, last query: {session.turns[-1][0]}", "CYAN")
     
     while True:
         user_input = input(f"Enter your command query: ")
@@ -67,22 +328,32 @@ def main():
 
         try:
             print_color("Fetching command suggestion...", "CYAN")
-            suggestion = llm_client.suggest_command(user_input, conversation_history)
-            print_color("Suggested Command:", "GREEN")
-            print_color(suggestion.command, "WHITE")
-            print_color("Explanation: \n", "BLUE")
-            print_color(suggestion.explanation, "BLUE")
+            printer = None if args.no_stream else SuggestionPrinter()
+            suggestion = llm_client.suggest_command(user_input, conversation_history, use_cache=not args.no_cache, on_field=printer)
+            if printer is None or not (printer.printed_command and printer.printed_explanation):
+                print_suggestion(suggestion)
+            elif "".join(printer.command) != suggestion.command:
+                # Local validation rejected the streamed command and the LLM corrected it
+                print_color("Corrected Command:", "GREEN")
+                print_color(suggestion.command, "WHITE")
+            if not args.host and llm_client.validate:
+                warn_problems(suggestion.command)
             print_color("Warning: This is a suggestion. Review and execute at your own risk.", "YELLOW")
 
             # Update conversation history
-            conversation_history.append({"role": "user", "content": user_input})
-            conversation_history.append({"role": "assistant", "content": suggestion.command})
+            if session:
+                # Older turns are folded into the session digest, the prompt stays the same size
+                session.add_turn(user_input, suggestion.command)
+                conversation_history = session.messages()
+            else:
+                conversation_history.append({"role": "user", "content": user_input})
+                conversation_history.append({"role": "assistant", "content": suggestion.command})
 
-            # Limit conversation history to the last 8 entries
-            if len(conversation_history) > 16:
-                conversation_history = conversation_history[-16:]
+            # The context builder fits history into the token budget, this only bounds memory
+            if len(conversation_history) > MAX_HISTORY_MESSAGES:
+                conversation_history = conversation_history[-MAX_HISTORY_MESSAGES:]
 
-        except ValueError as e:
+        except (ValueError, BackendError) as e:
             print_color(str(e), "RED")
         print("-" * 40, "\n")
 
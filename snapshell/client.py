@@ -0,0 +1,61 @@
+# client.py
+# Thin client for the resident daemon. Only the standard library may be imported here.
+import argparse
+import json
+import os
+import socket
+import sys
+
+SOCKET_PATH = os.environ.get("SNAPSHELL_SOCKET", os.path.expanduser("~/.snapshell/daemon.sock"))
+
+# Generous enough for a full LLM round-trip under rate limiting
+REQUEST_TIMEOUT = 120
+
+
+class DaemonUnavailable(Exception):
+    pass
+
+
+def ask(query, history=None, no_cache=False, socket_path=SOCKET_PATH, timeout=REQUEST_TIMEOUT):
+    request = {"query": query, "history": history or [], "no_cache": no_cache}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as response_file:
+                line = response_file.readline()
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        raise DaemonUnavailable(f"SnapShell daemon is not running at {socket_path}. Start it with: snapshell --daemon") from e
+
+    if not line:
+        raise DaemonUnavailable("SnapShell daemon closed the connection without answering.")
+    return json.loads(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="snapshell ask", description="Ask the running SnapShell daemon for a command.")
+    parser.add_argument('query', nargs='+', help="What you want to do")
+    parser.add_argument('--json', action='store_true', help="Print the full JSON response")
+    parser.add_argument('--no-cache', action='store_true', help="Skip the suggestion cache")
+    args = parser.parse_args(argv)
+
+    try:
+        response = ask(" ".join(args.query), no_cache=args.no_cache)
+    except (DaemonUnavailable, OSError) as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    if "error" in response:
+        print(response["error"], file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(response))
+    else:
+        print(response["command"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+# colors.py
+# Terminal output helpers. Standard library only, the `snapshell ask` path imports this.
+
+# ANSI escape codes for colors
+RESET = "\033[0m"
+CYAN = "\033[36m"
+GREEN = "\033[32m"
+WHITE = "\033[37m"
+BLUE = "\033[34m"
+YELLOW = "\033[33m"
+RED = "\033[31m"
+
+def get_color(color:str):
+    col = color.lower()
+    if col == "cyan":
+        return CYAN
+    elif col == "green":
+        return GREEN
+    elif col == "white":
+        return WHITE
+    elif col == "blue":
+        return BLUE
+    elif col == "yellow":
+        return YELLOW
+    elif col == "red":
+        return RED
+    else:
+        return RESET
+    
+def print_color(text, color:str):
+    color = get_color(color)
+    print(f"{color}{text}{RESET}")
@@ -0,0 +1,29 @@
+# config.py
+import json
+import os
+
+# Configuration file path
+CONFIG_FILE = os.path.expanduser("~/.snapshell_config.json")
+
+
+def load_config():
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, "r") as config_file:
+            return json.load(config_file)
+    return {}
+
+
+def save_config(config):
+    with open(CONFIG_FILE, "w") as config_file:
+        json.dump(config, config_file)
+
+
+def load_api_key():
+    return load_config().get("GROQ_API_KEY")
+
+
+def save_api_key(api_key):
+    # Keep any other settings already in the file
+    config = load_config()
+    config["GROQ_API_KEY"] = api_key
+    save_config(config)
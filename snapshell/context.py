@@ -0,0 +1,206 @@
+# context.py
+import math
+import re
+from collections import Counter
+from .db import get_connection
+from .deps import load_dependency_graph
+from .search import tokenize
+
+# Total prompt budget, in estimated tokens, when the config does not set one
+DEFAULT_TOKEN_BUDGET = 1500
+# Instructions and formatting around the package list
+PROMPT_OVERHEAD_TOKENS = 90
+# Share of the budget conversation history may use before packages
+HISTORY_SHARE = 0.4
+# Share of the history budget reserved for the digest of dropped turns
+SUMMARY_SHARE = 0.25
+# How many retrieved packages are considered before ranking and packing
+CANDIDATE_POOL = 60
+# Recent suggestions scanned for the usage signal
+RECENT_SUGGESTIONS = 200
+# Top-ranked packages whose graph neighbours are offered as related tools
+RELATED_FROM_TOP = 3
+RELATED_LIMIT = 12
+# Hubs like zlib are needed by nearly everything and say nothing about the query
+RELATED_MAX_FANOUT = 15
+
+WEIGHTS = {
+    "retrieval": 1.0,
+    "overlap": 1.0,
+    "centrality": 0.3,
+    "usage": 0.5,
+}
+
+DIGEST_PREFIX = "Earlier in this conversation: "
+
+COMMAND_WORD_RE = re.compile(r"[\w.+-]+")
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for English text and shell syntax
+    return max(1, math.ceil(len(text) / 4))
+
+
+def recent_command_words():
+    rows = get_connection().execute(
+        "SELECT command FROM command_suggestions ORDER BY id DESC LIMIT ?", (RECENT_SUGGESTIONS,)
+    )
+    words = Counter()
+    for (command,) in rows:
+        words.update(set(COMMAND_WORD_RE.findall(command or "")))
+    return words
+
+
+def rank_packages(user_input, candidates):
+    """
+    Order retrieved packages by a weighted mix of retrieval rank, query-term
+    overlap, reverse-dependency centrality and recent usage in suggestions.
+    """
+    if not candidates:
+        return []
+
+    query_terms = set(tokenize(user_input))
+    graph = load_dependency_graph()
+    max_centrality = math.log1p(max((len(names) for names in graph.reverse.values()), default=0)) or 1.0
+    usage = recent_command_words()
+
+    scored = []
+    for position, pkg in enumerate(candidates):
+        name_terms = set(tokenize(pkg["name"]))
+        description_terms = set(tokenize(pkg.get("description") or ""))
+        overlap = 0.0
+        if query_terms:
+            overlap = (2 * len(query_terms & name_terms) + len(query_terms & description_terms)) / (2 * len(query_terms))
+
+        score = (
+            WEIGHTS["retrieval"] / (1 + position)
+            + WEIGHTS["overlap"] * overlap
+            + WEIGHTS["centrality"] * math.log1p(graph.dependent_count(pkg["name"])) / max_centrality
+            + WEIGHTS["usage"] * min(1.0, usage.get(pkg["name"], 0) / 3)
+        )
+        scored.append((score, position, pkg))
+
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [pkg for _, _, pkg in scored]
+
+
+def related_packages(ranked_packages, exclude):
+    """
+    Installed packages next to the top results in the dependency graph, e.g.
+    the zstd tool for a libzstd match. Libraries are left out.
+    """
+    graph = load_dependency_graph()
+    related = []
+    for pkg in ranked_packages[:RELATED_FROM_TOP]:
+        if graph.dependent_count(pkg["name"]) > RELATED_MAX_FANOUT:
+            continue
+        for name in graph.dependents(pkg["name"]) + graph.dependencies(pkg["name"]):
+            if name in exclude or name in related or name.startswith("lib"):
+                continue
+            related.append(name)
+    return related[:RELATED_LIMIT]
+
+
+def format_package(pkg):
+    line = f"{pkg['name']}: {pkg['version']}, Description: {pkg.get('description') or 'No description available'}"
+    if pkg.get("commands"):
+        line += f", Commands: {', '.join(pkg['commands'])}"
+    return line
+
+
+def pack_packages(ranked_packages, budget):
+    lines = []
+    used = 0
+    for pkg in ranked_packages:
+        line = format_package(pkg)
+        cost = estimate_tokens(line)
+        if used + cost > budget:
+            continue
+        lines.append(line)
+        used += cost
+    return lines
+
+
+def digest_part(question, answer):
+    return f'"{" ".join(question.split())[:80]}" -> {" ".join(answer.split())[:80]}'
+
+
+def fit_digest(parts, budget):
+    # Newest parts are kept first when the digest has to be cut
+    digest = []
+    used = estimate_tokens(DIGEST_PREFIX)
+    for part in reversed(parts):
+        cost = estimate_tokens(part) + 1
+        if used + cost > budget:
+            break
+        digest.insert(0, part)
+        used += cost
+    return digest
+
+
+def digest_message(parts):
+    return {"role": "system", "content": DIGEST_PREFIX + "; ".join(parts)}
+
+
+def summarize_turns(messages, budget):
+    # Compact digest of dropped turns
+    parts = []
+    pending_question = None
+    for message in messages:
+        if message["role"] == "user":
+            pending_question = message["content"]
+        elif pending_question is not None:
+            parts.append(digest_part(pending_question, message["content"]))
+            pending_question = None
+
+    digest = fit_digest(parts, budget)
+    if not digest:
+        return None
+    return digest_message(digest)
+
+
+def trim_history(conversation_history, budget):
+    """
+    Keep the most recent messages that fit the budget, folding the older
+    ones into a single summary message.
+    """
+    history = list(conversation_history)
+    if sum(estimate_tokens(message["content"]) for message in history) <= budget:
+        return history
+
+    kept = []
+    used = 0
+    recent_budget = budget * (1 - SUMMARY_SHARE)
+    for message in reversed(history):
+        cost = estimate_tokens(message["content"])
+        if used + cost > recent_budget:
+            break
+        kept.insert(0, message)
+        used += cost
+
+    # Never start the kept window with an orphaned assistant reply
+    while kept and kept[0]["role"] == "assistant":
+        kept.pop(0)
+
+    dropped = history[:len(history) - len(kept)]
+    summary = summarize_turns(dropped, budget - sum(estimate_tokens(m["content"]) for m in kept))
+    return ([summary] if summary else []) + kept
+
+
+def build_context(user_input, conversation_history, candidates, budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Split the token budget between conversation history and ranked package
+    lines. Returns (package_lines, history_messages).
+    """
+    remaining = max(0, budget - PROMPT_OVERHEAD_TOKENS - estimate_tokens(user_input))
+    history = trim_history(conversation_history, int(remaining * HISTORY_SHARE))
+    package_budget = remaining - sum(estimate_tokens(message["content"]) for message in history)
+    ranked = rank_packages(user_input, candidates)
+    package_lines = pack_packages(ranked, package_budget)
+
+    related = related_packages(ranked, {pkg["name"] for pkg in ranked})
+    if package_lines and related:
+        related_line = "Related installed packages: " + ", ".join(related)
+        if sum(map(estimate_tokens, package_lines)) + estimate_tokens(related_line) <= package_budget:
+            package_lines.append(related_line)
+    return package_lines, history
@@ -0,0 +1,91 @@
+# daemon.py
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from .client import SOCKET_PATH
+from .utils import print_color
+
+# Worker threads are reused, so each keeps its SQLite connection warm
+WORKERS = 4
+
+
+class SuggestionHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+            suggestion = self.server.llm_client.suggest_command(
+                request["query"], request.get("history", []), use_cache=not request.get("no_cache", False)
+            )
+            response = {"command": suggestion.command, "explanation": suggestion.explanation}
+        except Exception as e:
+            response = {"error": str(e)}
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class SuggestionServer(socketserver.UnixStreamServer):
+    def __init__(self, socket_path, llm_client, workers=WORKERS):
+        self.llm_client = llm_client
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="snapshell-daemon")
+        super().__init__(socket_path, SuggestionHandler)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def remove_stale_socket(socket_path):
+    if not os.path.exists(socket_path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(socket_path)
+            return
+    raise RuntimeError(f"A SnapShell daemon is already listening on {socket_path}")
+
+
+def serve(llm_client, socket_path=SOCKET_PATH):
+    """
+    Serve suggestions from an initialised LLMClient over a Unix socket, one JSON
+    request and one JSON response per line, until interrupted.
+    """
+    os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+    remove_stale_socket(socket_path)
+
+    # Only the owner may talk to the daemon, it answers with their API key
+    old_umask = os.umask(0o177)
+    try:
+        server = SuggestionServer(socket_path, llm_client)
+    finally:
+        os.umask(old_umask)
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print_color(f"SnapShell daemon listening on {socket_path}", "GREEN")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        print_color("SnapShell daemon stopped.", "CYAN")
@@ -0,0 +1,391 @@
+# db.py
+import os
+import sqlite3
+import threading
+
+DB_PATH = os.path.expanduser('~/.snapshell/system_info.db')
+
+# Applied to every new connection. auto_vacuum only takes effect on a new
+# database, older ones are converted by history.prune_history
+PRAGMAS = (
+    ("auto_vacuum", "INCREMENTAL"),
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("mmap_size", 64 * 1024 * 1024),
+    ("cache_size", -8000),
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", 5000),
+)
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_checked = False
+
+
+def get_connection():
+    """
+    Return this thread's long-lived connection to DB_PATH, creating the
+    database and running pending migrations on first use in the process.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, cached_statements=256)
+        for name, value in PRAGMAS:
+            conn.execute(f"PRAGMA {name} = {value}")
+        _local.conn = conn
+        ensure_schema(conn)
+    return conn
+
+
+def close_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+def ensure_schema(conn):
+    global _schema_checked
+    with _schema_lock:
+        if _schema_checked:
+            return
+        migrate(conn)
+        _schema_checked = True
+
+
+def migrate(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+
+def migration_1_initial_schema(conn):
+    # Uses IF NOT EXISTS so databases created before versioning are adopted as-is
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS system_config (
+            tool_name TEXT PRIMARY KEY,
+            version TEXT,
+            description TEXT,
+            depends_on TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS command_suggestions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_input TEXT,
+            command TEXT,
+            explanation TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS metadata (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS suggestion_cache (
+            key TEXT PRIMARY KEY,
+            command TEXT,
+            explanation TEXT,
+            created_at REAL,
+            last_used REAL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS suggestion_cache_last_used ON suggestion_cache (last_used)')
+    create_package_index(conn)
+
+
+def create_package_index(conn):
+    # Full-text index over system_config, kept in sync by triggers
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'package_index'"
+    ).fetchone()
+    if exists:
+        return
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE package_index USING fts5(
+                tool_name, description, depends_on,
+                content='system_config', tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5, search falls back to LIKE
+        return
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS system_config_ai AFTER INSERT ON system_config BEGIN
+            INSERT INTO package_index (rowid, tool_name, description, depends_on)
+            VALUES (new.rowid, new.tool_name, new.description, new.depends_on);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS system_config_ad AFTER DELETE ON system_config BEGIN
+            INSERT INTO package_index (package_index, rowid, tool_name, description, depends_on)
+            VALUES ('delete', old.rowid, old.tool_name, old.description, old.depends_on);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS system_config_au AFTER UPDATE ON system_config BEGIN
+            INSERT INTO package_index (package_index, rowid, tool_name, description, depends_on)
+            VALUES ('delete', old.rowid, old.tool_name, old.description, old.depends_on);
+            INSERT INTO package_index (rowid, tool_name, description, depends_on)
+            VALUES (new.rowid, new.tool_name, new.description, new.depends_on);
+        END
+    ''')
+    # Index rows that were stored before the index existed
+    conn.execute("INSERT INTO package_index (package_index) VALUES ('rebuild')")
+
+
+def migration_2_dependency_edges(conn):
+    from .deps import rebuild_dependency_edges
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS package_dependencies (
+            tool_name TEXT NOT NULL,
+            dependency TEXT NOT NULL,
+            version_constraint TEXT,
+            alternative_group INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS package_dependencies_tool_name ON package_dependencies (tool_name)')
+    conn.execute('CREATE INDEX IF NOT EXISTS package_dependencies_dependency ON package_dependencies (dependency)')
+    rebuild_dependency_edges(conn)
+
+
+def migration_3_package_vectors(conn):
+    # Row numbers into the memory-mapped matrix in package_vectors.npy
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS package_vectors (
+            tool_name TEXT PRIMARY KEY,
+            row INTEGER NOT NULL,
+            content_hash TEXT NOT NULL
+        )
+    ''')
+
+
+def migration_4_metrics(conn):
+    # One row per timed stage, see metrics.span
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            trace_id TEXT NOT NULL,
+            span_id TEXT NOT NULL,
+            parent_id TEXT,
+            stage TEXT NOT NULL,
+            started_at REAL NOT NULL,
+            duration_ms REAL NOT NULL,
+            attributes TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS metrics_started_at ON metrics (started_at)')
+
+
+def migration_5_history_index(conn):
+    # Keyset pagination and age-based retention walk (timestamp, id)
+    conn.execute('CREATE INDEX IF NOT EXISTS command_suggestions_timestamp ON command_suggestions (timestamp, id)')
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE history_index USING fts5(
+                user_input, command, content='command_suggestions', content_rowid='id'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5, history search falls back to LIKE
+        return
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS command_suggestions_ai AFTER INSERT ON command_suggestions BEGIN
+            INSERT INTO history_index (rowid, user_input, command) VALUES (new.id, new.user_input, new.command);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS command_suggestions_ad AFTER DELETE ON command_suggestions BEGIN
+            INSERT INTO history_index (history_index, rowid, user_input, command)
+            VALUES ('delete', old.id, old.user_input, old.command);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS command_suggestions_au AFTER UPDATE ON command_suggestions BEGIN
+            INSERT INTO history_index (history_index, rowid, user_input, command)
+            VALUES ('delete', old.id, old.user_input, old.command);
+            INSERT INTO history_index (rowid, user_input, command) VALUES (new.id, new.user_input, new.command);
+        END
+    ''')
+    conn.execute("INSERT INTO history_index (history_index) VALUES ('rebuild')")
+
+
+def migration_6_host_inventory(conn):
+    # Package sets imported from other hosts. Identical packages are stored once
+    # in package_builds, descriptions once in package_descriptions, and shared
+    # by every host that has them.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS hosts (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            package_manager TEXT,
+            source TEXT,
+            imported_at REAL,
+            package_count INTEGER
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS package_descriptions (
+            id INTEGER PRIMARY KEY,
+            description TEXT NOT NULL UNIQUE
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS package_builds (
+            id INTEGER PRIMARY KEY,
+            digest BLOB NOT NULL UNIQUE,
+            tool_name TEXT NOT NULL,
+            version TEXT,
+            description_id INTEGER,
+            depends_on TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS package_builds_tool_name ON package_builds (tool_name)')
+    conn.execute('CREATE INDEX IF NOT EXISTS package_builds_description_id ON package_builds (description_id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS host_packages (
+            host_id INTEGER NOT NULL,
+            build_id INTEGER NOT NULL,
+            PRIMARY KEY (host_id, build_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS host_packages_build_id ON host_packages (build_id, host_id)')
+    conn.execute('''
+        CREATE VIEW IF NOT EXISTS inventory_packages AS
+        SELECT b.id, b.tool_name, b.version, d.description, b.depends_on
+        FROM package_builds AS b LEFT JOIN package_descriptions AS d ON d.id = b.description_id
+    ''')
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE inventory_index USING fts5(
+                tool_name, description, content='inventory_packages', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        return
+    # Builds are immutable, they are only ever inserted or garbage collected
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS package_builds_ai AFTER INSERT ON package_builds BEGIN
+            INSERT INTO inventory_index (rowid, tool_name, description)
+            VALUES (new.id, new.tool_name, (SELECT description FROM package_descriptions WHERE id = new.description_id));
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS package_builds_ad AFTER DELETE ON package_builds BEGIN
+            INSERT INTO inventory_index (inventory_index, rowid, tool_name, description)
+            VALUES ('delete', old.id, old.tool_name, (SELECT description FROM package_descriptions WHERE id = old.description_id));
+        END
+    ''')
+
+
+def migration_7_executables(conn):
+    # Commands found on $PATH and the package that installed each one, see executables.py.
+    # Directories are stored resolved and rescanned when their mtime changes
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS executables (
+            directory TEXT NOT NULL,
+            name TEXT NOT NULL,
+            package TEXT,
+            PRIMARY KEY (directory, name)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS executables_name ON executables (name)')
+    conn.execute('CREATE INDEX IF NOT EXISTS executables_package ON executables (package)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS executable_dirs (
+            directory TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL
+        )
+    ''')
+
+
+def migration_8_command_options(conn):
+    # Options parsed from man pages and --help, keyed by binary path and mtime, see validate.py.
+    # options is NULL when the documentation couldn't be parsed
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS command_options (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            options TEXT,
+            subcommands INTEGER NOT NULL,
+            last_used REAL NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS command_options_last_used ON command_options (last_used)')
+
+
+def migration_9_learned_intents(conn):
+    # How often each normalized query was answered with each command, mined from
+    # command_suggestions by intents.mine_learned_templates
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS learned_intents (
+            phrase TEXT NOT NULL,
+            command TEXT NOT NULL,
+            explanation TEXT,
+            hits INTEGER NOT NULL,
+            PRIMARY KEY (phrase, command)
+        ) WITHOUT ROWID
+    ''')
+
+
+def migration_10_sessions(conn):
+    # Named conversations, see sessions.py. digest is a JSON list of folded turns
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            digest TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS session_turns (
+            session_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            suggestion_id INTEGER NOT NULL,
+            PRIMARY KEY (session_id, position)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS session_turns_suggestion_id ON session_turns (suggestion_id)')
+
+
+# Append new migrations, never edit or reorder applied ones
+MIGRATIONS = [
+    migration_1_initial_schema,
+    migration_2_dependency_edges,
+    migration_3_package_vectors,
+    migration_4_metrics,
+    migration_5_history_index,
+    migration_6_host_inventory,
+    migration_7_executables,
+    migration_8_command_options,
+    migration_9_learned_intents,
+    migration_10_sessions,
+]
+
+
+def get_metadata(conn, key):
+    row = conn.execute("SELECT value FROM metadata WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def set_metadata(conn, key, value):
+    conn.execute(
+        "INSERT INTO metadata (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+        (key, value),
+    )
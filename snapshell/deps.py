@@ -0,0 +1,118 @@
+# deps.py
+import argparse
+import re
+from collections import deque
+from .db import get_connection, get_metadata
+
+# "libc6 (>= 2.34)", "python3:any", "glibc>=2.38", "libcap.so=2-64"
+DEPENDENCY_RE = re.compile(r"^\s*([^\s(<>=:]+)(?::\S+)?\s*(?:\(\s*([^)]*)\)|([<>=]+\s*\S+))?")
+
+_graphs = {}
+
+
+def parse_depends(depends_on):
+    """
+    Parse a stored depends_on string into (dependency, version_constraint,
+    alternative_group) tuples. Alternatives ("a | b") share a group number.
+    Handles both dpkg and pacman spellings.
+    """
+    edges = []
+    if not depends_on:
+        return edges
+    for group, dependency in enumerate(depends_on.split(",")):
+        for alternative in dependency.split("|"):
+            match = DEPENDENCY_RE.match(alternative)
+            if not match:
+                continue
+            constraint = (match.group(2) or match.group(3) or "").replace(" ", "")
+            edges.append((match.group(1), constraint or None, group))
+    return edges
+
+
+def dependency_rows(name, depends_on):
+    return [(name, dependency, constraint, group) for dependency, constraint, group in parse_depends(depends_on)]
+
+
+def rebuild_dependency_edges(conn):
+    conn.execute("DELETE FROM package_dependencies")
+    for name, depends_on in conn.execute("SELECT tool_name, depends_on FROM system_config").fetchall():
+        write_dependency_edges(conn, name, depends_on)
+
+
+def write_dependency_edges(conn, name, depends_on):
+    conn.executemany('''
+        INSERT INTO package_dependencies (tool_name, dependency, version_constraint, alternative_group)
+        VALUES (?, ?, ?, ?)
+    ''', dependency_rows(name, depends_on))
+
+
+class DependencyGraph:
+    """
+    Forward and reverse adjacency over installed packages, loaded from the
+    package_dependencies table.
+    """
+
+    def __init__(self, edges):
+        self.forward = {}
+        self.reverse = {}
+        for name, dependency in edges:
+            self.forward.setdefault(name, set()).add(dependency)
+            self.reverse.setdefault(dependency, set()).add(name)
+
+    def dependencies(self, name):
+        return sorted(self.forward.get(name, ()))
+
+    def dependents(self, name):
+        return sorted(self.reverse.get(name, ()))
+
+    def closure(self, name, reverse=False):
+        # Transitive dependencies (or dependents), excluding the package itself
+        adjacency = self.reverse if reverse else self.forward
+        seen = set()
+        queue = deque([name])
+        while queue:
+            for neighbour in adjacency.get(queue.popleft(), ()):
+                if neighbour not in seen and neighbour != name:
+                    seen.add(neighbour)
+                    queue.append(neighbour)
+        return sorted(seen)
+
+    def dependent_count(self, name):
+        return len(self.reverse.get(name, ()))
+
+
+def load_dependency_graph():
+    # Rebuilt only after update_database changed the stored packages, --rebuild-db included
+    conn = get_connection()
+    generation = get_metadata(conn, "packages_generation")
+    if generation not in _graphs:
+        edges = conn.execute("SELECT tool_name, dependency FROM package_dependencies")
+        _graphs.clear()
+        _graphs[generation] = DependencyGraph(edges)
+    return _graphs[generation]
+
+
+def main(argv, reverse=False):
+    from .utils import print_color
+
+    command = "rdeps" if reverse else "deps"
+    parser = argparse.ArgumentParser(
+        prog=f"snapshell {command}",
+        description="List installed packages that depend on a package." if reverse else "List the dependencies of an installed package.",
+    )
+    parser.add_argument('package', help="Package name")
+    parser.add_argument('-r', '--recursive', action='store_true', help="Follow the dependency graph transitively")
+    args = parser.parse_args(argv)
+
+    graph = load_dependency_graph()
+    if args.recursive:
+        names = graph.closure(args.package, reverse=reverse)
+    else:
+        names = graph.dependents(args.package) if reverse else graph.dependencies(args.package)
+
+    if not names:
+        print_color(f"No {'dependents' if reverse else 'dependencies'} found for {args.package}.", "YELLOW")
+        return 0
+    for name in names:
+        print(name)
+    return 0
@@ -0,0 +1,332 @@
+# executables.py
+# Index of the commands actually on $PATH and the packages that ship them, so
+# suggestions can be checked against the machine without asking the LLM again.
+import os
+from .db import get_connection
+
+# Always scanned, even when $PATH is minimal (cron, sudo's secure_path)
+DEFAULT_DIRS = ('/usr/local/sbin', '/usr/local/bin', '/usr/sbin', '/usr/bin', '/sbin', '/bin')
+# Commands listed per package in the prompt
+COMMANDS_PER_PACKAGE = 4
+
+SHELL_BUILTINS = frozenset((
+    'alias', 'bg', 'bind', 'break', 'builtin', 'case', 'cd', 'command', 'continue', 'declare', 'do',
+    'done', 'echo', 'elif', 'else', 'esac', 'eval', 'exec', 'exit', 'export', 'false', 'fc', 'fg',
+    'fi', 'for', 'function', 'getopts', 'hash', 'help', 'history', 'if', 'jobs', 'kill', 'let',
+    'local', 'popd', 'printf', 'pushd', 'pwd', 'read', 'readonly', 'return', 'select', 'set',
+    'shift', 'source', 'test', 'then', 'time', 'times', 'trap', 'true', 'type', 'typeset', 'ulimit',
+    'umask', 'unalias', 'unset', 'until', 'wait', 'while', '.', ':', '[', '[[', '!', '{', '}',
+))
+# Run the command given after their own options
+WRAPPERS = frozenset(('sudo', 'doas', 'env', 'nohup', 'nice', 'time', 'exec', 'command', 'xargs', 'watch'))
+# Wrapper options that take a separate value, e.g. sudo -u user
+WRAPPER_VALUE_OPTIONS = frozenset(('-u', '-g', '-n', '-C', '-D', '-h'))
+OPERATORS = frozenset(('|', '||', '&', '&&', ';', ';;', '(', ')', '|&'))
+# Followed by a file name or here-document delimiter, never by a program
+REDIRECTIONS = frozenset(('<', '>', '>>', '>|', '<>', '<&', '>&', '&>', '&>>', '<<', '<<-', '<<<'))
+# Longest first, so ">>" is not read as two ">"
+SHELL_OPERATORS = sorted(OPERATORS | REDIRECTIONS, key=len, reverse=True)
+
+# name -> package (None for files no package owns), loaded once per process
+_installed = None
+
+
+def path_directories():
+    """
+    Resolved $PATH directories plus DEFAULT_DIRS in lookup order, each once,
+    so a merged /bin -> /usr/bin is only scanned a single time.
+    """
+    directories = []
+    for directory in os.environ.get('PATH', '').split(os.pathsep) + list(DEFAULT_DIRS):
+        if not os.path.isabs(directory):
+            continue
+        resolved = os.path.realpath(directory)
+        if resolved not in directories and os.path.isdir(resolved):
+            directories.append(resolved)
+    return directories
+
+
+def scan_directory(directory):
+    names = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and os.access(entry.path, os.X_OK):
+                        names.append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return names
+
+
+def package_owners(package_manager, directories):
+    # (resolved directory, name) -> package for files installed into directories
+    file_lists = package_manager.read_file_lists() if package_manager else None
+    if file_lists is None:
+        return {}
+    owners = {}
+    resolved = {}
+    for package, path in file_lists:
+        directory, name = os.path.split(path)
+        if directory not in resolved:
+            resolved[directory] = os.path.realpath(directory) if directory else None
+        if resolved[directory] in directories and name:
+            owners.setdefault((resolved[directory], name), package)
+    return owners
+
+
+def refresh_executables(conn, package_manager, force=False):
+    """
+    Rescan the $PATH directories whose mtime changed since the last refresh
+    (all of them with force) and record which package owns each command.
+    Returns the number of directories rescanned.
+    """
+    global _installed
+
+    directories = path_directories()
+    known = dict(conn.execute("SELECT directory, mtime_ns FROM executable_dirs"))
+    stale = {}
+    for directory in directories:
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            continue
+        if force or known.get(directory) != mtime_ns:
+            stale[directory] = mtime_ns
+
+    gone = [(directory,) for directory in known if directory not in directories]
+    conn.executemany("DELETE FROM executables WHERE directory = ?", gone)
+    conn.executemany("DELETE FROM executable_dirs WHERE directory = ?", gone)
+    if not stale and not gone:
+        return 0
+
+    # Reading every package's file list is the expensive part, only done when something moved
+    owners = package_owners(package_manager, set(stale)) if stale else {}
+    for directory, mtime_ns in stale.items():
+        conn.execute("DELETE FROM executables WHERE directory = ?", (directory,))
+        conn.executemany(
+            "INSERT INTO executables (directory, name, package) VALUES (?, ?, ?)",
+            [(directory, name, owners.get((directory, name))) for name in scan_directory(directory)],
+        )
+        conn.execute(
+            "INSERT INTO executable_dirs (directory, mtime_ns) VALUES (?, ?) "
+            "ON CONFLICT (directory) DO UPDATE SET mtime_ns = excluded.mtime_ns",
+            (directory, mtime_ns),
+        )
+    _installed = None
+    return len(stale)
+
+
+def installed_executables():
+    global _installed
+    if _installed is None:
+        order = {directory: index for index, directory in enumerate(path_directories())}
+        rows = get_connection().execute("SELECT directory, name, package FROM executables").fetchall()
+        # The first directory on $PATH wins, as it would in the shell
+        rows.sort(key=lambda row: order.get(row[0], len(order)))
+        installed = {}
+        for _, name, package in rows:
+            installed.setdefault(name, package)
+        _installed = installed
+    return _installed
+
+
+def is_installed(name):
+    return name in installed_executables()
+
+
+def executable_package(name):
+    return installed_executables().get(name)
+
+
+def path_package(path):
+    # Package that installed the file at path, None unless path is an indexed $PATH entry
+    row = get_connection().execute(
+        "SELECT package FROM executables WHERE directory = ? AND name = ?",
+        (os.path.realpath(os.path.dirname(path)), os.path.basename(path)),
+    ).fetchone()
+    return row[0] if row else None
+
+
+def package_executables(packages):
+    # package -> the commands it ships, the one named like the package first
+    if not packages:
+        return {}
+    commands = {}
+    rows = get_connection().execute(
+        f"SELECT DISTINCT package, name FROM executables WHERE package IN ({', '.join('?' * len(packages))})",
+        list(packages),
+    )
+    for package, name in rows:
+        # Skips names like [ that tell the model nothing
+        if name[0].isalnum():
+            commands.setdefault(package, []).append(name)
+    for package, names in commands.items():
+        names.sort(key=lambda name: (name != package, len(name), name))
+        del names[COMMANDS_PER_PACKAGE:]
+    return commands
+
+
+def substitution_end(command, start):
+    # Index just past the ) closing a $( or <( whose body starts at start
+    depth = 1
+    i = start
+    while i < len(command):
+        char = command[i]
+        if char == '\\':
+            i += 1
+        elif char == "'":
+            i = command.index("'", i + 1)
+        elif char == '"':
+            i = quote_end(command, i + 1, [])
+            continue
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    raise ValueError("unbalanced parenthesis")
+
+
+def quote_end(command, start, substitutions):
+    # Index just past the " closing a double-quoted string that starts at start
+    i = start
+    while i < len(command):
+        if command[i] == '\\':
+            i += 2
+        elif command.startswith('$(', i):
+            end = substitution_end(command, i + 2)
+            substitutions.append(command[i + 2:end - 1])
+            i = end
+        elif command[i] == '"':
+            return i + 1
+        else:
+            i += 1
+    raise ValueError("unbalanced quote")
+
+
+def shell_tokens(command):
+    """
+    Split a command line into words and operators the way the shell does.
+    Quotes, $(...), `...` and <(...) stay part of the word they appear in and
+    the commands they run are returned separately. Words are (False, text)
+    and operators (True, text); raises ValueError on unbalanced quoting.
+    """
+    tokens, substitutions, word = [], [], None
+    i = 0
+    while i < len(command):
+        char = command[i]
+        if char in ' \t\n':
+            if word is not None:
+                tokens.append((False, word))
+                word = None
+            i += 1
+            continue
+        if command.startswith(('$(', '<(', '>('), i):
+            end = substitution_end(command, i + 2)
+            # $(( )) is arithmetic, not a command
+            if not command.startswith('$((', i):
+                substitutions.append(command[i + 2:end - 1])
+            word = (word or '') + command[i:end]
+            i = end
+            continue
+        if char in '|&;()<>':
+            # 2>&1: the digits before a redirection are its file descriptor
+            if word is not None and not (word.isdigit() and char in '<>'):
+                tokens.append((False, word))
+            word = None
+            operator = next(op for op in SHELL_OPERATORS if command.startswith(op, i))
+            tokens.append((True, operator))
+            i += len(operator)
+            continue
+        if char == '\\':
+            word = (word or '') + command[i + 1:i + 2]
+            i += 2
+        elif char == "'":
+            end = command.index("'", i + 1)
+            word = (word or '') + command[i + 1:end]
+            i = end + 1
+        elif char == '"':
+            end = quote_end(command, i + 1, substitutions)
+            word = (word or '') + command[i + 1:end - 1]
+            i = end
+        elif char == '`':
+            end = command.index('`', i + 1)
+            substitutions.append(command[i + 1:end])
+            word = (word or '') + command[i:end + 1]
+            i = end + 1
+        else:
+            word = (word or '') + char
+            i += 1
+    if word is not None:
+        tokens.append((False, word))
+    return tokens, substitutions
+
+
+def command_stages(command):
+    """
+    The programs a shell command line would run with their arguments, one
+    (name, args) pair per pipeline stage, looking through wrappers like sudo
+    and env and through leading VAR=value assignments. Commands inside $(...)
+    follow the line's own stages. Returns [] when the line can't be parsed.
+    """
+    try:
+        tokens, substitutions = shell_tokens(command)
+    except ValueError:
+        return []
+
+    stages = []
+    expecting = True
+    skip_value = False
+    redirect_target = False
+    for is_operator, token in tokens:
+        if redirect_target and not is_operator:
+            redirect_target = False
+            continue
+        redirect_target = False
+        if is_operator:
+            if token in REDIRECTIONS:
+                redirect_target = True
+            # ( opens a subshell only where a command may start
+            elif token != '(' or expecting:
+                expecting = token != ')'
+            continue
+        if not expecting:
+            stages[-1][1].append(token)
+            continue
+        if skip_value:
+            skip_value = False
+        elif '=' in token and not token.startswith('=') and token.split('=', 1)[0].isidentifier():
+            continue
+        elif stages and stages[-1][0] in WRAPPERS and token.startswith('-'):
+            skip_value = token in WRAPPER_VALUE_OPTIONS
+        else:
+            stages.append((token, []))
+            expecting = token in WRAPPERS
+    for substitution in substitutions:
+        stages.extend(command_stages(substitution))
+    return stages
+
+
+def command_names(command):
+    return [name for name, _ in command_stages(command)]
+
+
+def executable_missing(name):
+    if '/' in name:
+        path = os.path.expanduser(name)
+        return os.path.isabs(path) and not os.access(path, os.X_OK)
+    return not is_installed(name)
+
+
+def missing_executables(command):
+    # Commands in a suggestion that aren't builtins and can't be found on this machine
+    missing = []
+    for name in command_names(command):
+        if name not in SHELL_BUILTINS and name not in missing and executable_missing(name):
+            missing.append(name)
+    return missing
@@ -0,0 +1,256 @@
+# history.py
+import atexit
+import csv
+import json
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from .config import load_config
+from .db import get_connection, get_metadata, set_metadata
+
+# Seconds to wait for more entries before writing a partial batch
+FLUSH_INTERVAL = 0.5
+BATCH_SIZE = 64
+# Producers block instead of dropping entries once this many are pending
+MAX_PENDING = 1024
+# Seconds before a batch that failed to write is tried once more
+RETRY_DELAY = 0.2
+# Seconds flush() and close() wait for the writer before giving up
+FLUSH_TIMEOUT = 10
+# Rows fetched per keyset page when reading history back
+PAGE_SIZE = 500
+# Configured retention is applied at most this often by the writer
+PRUNE_INTERVAL_SECONDS = 3600
+# Free pages returned to the filesystem per prune, keeps each prune short
+VACUUM_PAGES = 2000
+
+HISTORY_COLUMNS = ("id", "user_input", "command", "explanation", "timestamp")
+
+_STOP = object()
+
+
+class HistoryWriter:
+    """
+    Persists command suggestions on a background thread so the caller can show
+    the answer before anything touches the disk. Entries are batched into one
+    transaction and everything queued is written before the process exits.
+    """
+
+    thread_name = "snapshell-history"
+    entry_name = "history entries"
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL, batch_size=BATCH_SIZE, max_pending=MAX_PENDING):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self.run, name=self.thread_name, daemon=True)
+            self.thread.start()
+            atexit.register(self.close)
+
+    def submit(self, user_input, command, explanation, session_id=None):
+        self.start()
+        # CURRENT_TIMESTAMP format, taken now rather than when the batch lands
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+        self.queue.put((user_input, command, explanation, timestamp, session_id))
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        # Wait until everything submitted so far has been written or dropped
+        if self.thread is None or not self.thread.is_alive():
+            return
+        with self.queue.all_tasks_done:
+            self.queue.all_tasks_done.wait_for(lambda: not self.queue.unfinished_tasks, timeout)
+
+    def close(self):
+        if self.thread is None or not self.thread.is_alive():
+            return
+        self.queue.put(_STOP)
+        self.thread.join(FLUSH_TIMEOUT)
+        atexit.unregister(self.close)
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            item = self.queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    self.queue.task_done()
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if batch:
+                self.write(batch)
+
+    def write(self, batch):
+        """
+        Insert a batch, trying once more after an SQLite error (usually a lock
+        held past busy_timeout). A batch that fails twice is dropped with a
+        warning so the writer keeps serving later entries.
+        """
+        try:
+            try:
+                self.insert(batch)
+            except sqlite3.Error:
+                time.sleep(RETRY_DELAY)
+                self.insert(batch)
+        except sqlite3.Error as e:
+            print(f"snapshell: {len(batch)} {self.entry_name} not saved: {e}", file=sys.stderr)
+        finally:
+            for _ in batch:
+                self.queue.task_done()
+
+    def insert(self, batch):
+        conn = get_connection()
+        with conn:
+            for *row, session_id in batch:
+                suggestion_id = conn.execute('''
+                    INSERT INTO command_suggestions (user_input, command, explanation, timestamp)
+                    VALUES (?, ?, ?, ?)
+                ''', row).lastrowid
+                # Session turns point at the suggestion instead of storing the text twice
+                if session_id is not None:
+                    conn.execute('''
+                        INSERT INTO session_turns (session_id, position, suggestion_id)
+                        VALUES (?, (SELECT COALESCE(MAX(position), 0) + 1 FROM session_turns WHERE session_id = ?), ?)
+                    ''', (session_id, session_id, suggestion_id))
+        apply_retention(conn)
+
+
+history_writer = HistoryWriter()
+
+
+def history_filter(conn, query):
+    # FROM/WHERE fragments restricting command_suggestions (aliased c) to rows matching query
+    from .search import tokenize
+
+    if not query:
+        return "", [], []
+    tokens = tokenize(query) or [query.lower()]
+    has_index = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'history_index'"
+    ).fetchone()
+    if has_index:
+        # Every term must match, prefix matching so "compress" finds "compression"
+        expression = " ".join('"{}"*'.format(tok.replace('"', '""')) for tok in tokens)
+        return "JOIN history_index ON history_index.rowid = c.id", ["history_index MATCH ?"], [expression]
+    clauses = ["(c.user_input LIKE ? OR c.command LIKE ?)"] * len(tokens)
+    return "", clauses, [f"%{tok}%" for tok in tokens for _ in range(2)]
+
+
+def iter_history(query=None, limit=None, page_size=PAGE_SIZE):
+    """
+    Yield history rows (see HISTORY_COLUMNS) newest first, one keyset page at a
+    time so memory stays flat however long the history is. With a query only
+    rows whose input or command match it are yielded.
+    """
+    history_writer.flush()
+    conn = get_connection()
+    join, clauses, params = history_filter(conn, query)
+    after = None
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = page_size if remaining is None else min(page_size, remaining)
+        page_clauses = clauses + ["(c.timestamp, c.id) < (?, ?)"] if after else clauses
+        where = f"WHERE {' AND '.join(page_clauses)}" if page_clauses else ""
+        rows = conn.execute(f'''
+            SELECT c.id, c.user_input, c.command, c.explanation, c.timestamp
+            FROM command_suggestions c {join} {where}
+            ORDER BY c.timestamp DESC, c.id DESC LIMIT ?
+        ''', (*params, *(after or ()), size)).fetchall()
+        yield from rows
+        if len(rows) < size:
+            return
+        if remaining is not None:
+            remaining -= len(rows)
+        after = (rows[-1][4], rows[-1][0])
+
+
+def export_history(output, fmt="jsonl", query=None, limit=None):
+    # Streams rows straight from the keyset pages to output, returns the row count
+    count = 0
+    rows = iter_history(query, limit)
+    if fmt == "csv":
+        writer = csv.writer(output)
+        writer.writerow(HISTORY_COLUMNS)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            output.write(json.dumps(dict(zip(HISTORY_COLUMNS, row))) + "\n")
+            count += 1
+    return count
+
+
+def prune_history(conn, max_rows=None, max_age_days=None, full_vacuum=False):
+    """
+    Delete suggestions older than max_age_days and all but the newest max_rows,
+    then hand freed pages back with an incremental vacuum. A database created
+    before auto_vacuum was enabled is only converted (a full VACUUM) when
+    full_vacuum is set. Returns the number of rows removed.
+    """
+    from .sessions import TAIL_TURNS
+
+    # Turns a session replays on resume are kept, older ones live on in its digest
+    protected = '''
+        id NOT IN (
+            SELECT t.suggestion_id FROM session_turns AS t
+            WHERE t.position > (SELECT MAX(position) FROM session_turns WHERE session_id = t.session_id) - ?
+        )
+    '''
+    removed = 0
+    with conn:
+        if max_age_days:
+            removed += conn.execute(
+                f"DELETE FROM command_suggestions WHERE timestamp < datetime('now', ?) AND {protected}",
+                (f"-{max_age_days} days", TAIL_TURNS),
+            ).rowcount
+        if max_rows:
+            removed += conn.execute(f'''
+                DELETE FROM command_suggestions WHERE (timestamp, id) < (
+                    SELECT timestamp, id FROM command_suggestions ORDER BY timestamp DESC, id DESC LIMIT 1 OFFSET ?
+                ) AND {protected}
+            ''', (max_rows - 1, TAIL_TURNS)).rowcount
+        conn.execute("DELETE FROM session_turns WHERE suggestion_id NOT IN (SELECT id FROM command_suggestions)")
+
+    # 2 is INCREMENTAL
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        conn.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES})").fetchall()
+    elif full_vacuum:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    return removed
+
+
+def apply_retention(conn):
+    # Enforce history_max_rows / history_max_age_days from the config, at most once per interval
+    config = load_config()
+    max_rows, max_age_days = config.get("history_max_rows"), config.get("history_max_age_days")
+    if not (max_rows or max_age_days):
+        return
+    if time.time() - float(get_metadata(conn, "history_pruned_at") or 0) < PRUNE_INTERVAL_SECONDS:
+        return
+    try:
+        prune_history(conn, max_rows, max_age_days)
+        with conn:
+            set_metadata(conn, "history_pruned_at", str(time.time()))
+    except sqlite3.Error:
+        # Busy with another writer, the next batch tries again. Never raised
+        # to write(), which would insert the already committed batch again.
+        pass
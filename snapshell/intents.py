@@ -0,0 +1,292 @@
+# intents.py
+# Offline answers for common queries ("disk usage", "install htop") without an LLM call.
+# Phrases from a built-in template library and from often repeated history entries
+# are compiled into a word trie; a match that covers enough of the query is answered
+# directly, anything else falls through to the LLM.
+import re
+import shlex
+from collections import Counter, namedtuple
+from .db import get_connection, get_metadata, set_metadata
+from .executables import command_stages
+from .search import STOPWORDS
+
+# Share of the query's words a phrase must cover to answer without the LLM
+MIN_CONFIDENCE = 0.75
+# Lower bar used only when the LLM can't be reached, never for destructive answers
+OFFLINE_CONFIDENCE = 0.4
+# A history query becomes a learned template after this many answers,
+# when this share of them agree on one command
+LEARN_MIN_HITS = 3
+LEARN_MIN_SHARE = 0.8
+# Longer queries are one-off questions, not worth learning
+LEARN_MAX_WORDS = 8
+
+WORD_RE = re.compile(r"[a-z0-9][a-z0-9+._:-]*")
+PACKAGE_RE = re.compile(r"^[a-z0-9][a-z0-9+._-]*$")
+# A process name, a bare number is a PID or a port
+PROCESS_RE = re.compile(r"^(?!\d+$)[\w.+-]+$")
+# Words that don't change which command is meant
+FILLER = frozenset(("all", "currently", "quickly", "command", "terminal", "every", "per", "much", "some", "has", "have", "been"))
+# Words that describe what to look for rather than name it, never a slot value
+DESCRIPTIVE = frozenset((
+    "containing", "named", "called", "listening", "running", "port", "ports", "file", "files",
+    "process", "processes", "package", "packages", "updates", "upgrades", "text",
+))
+SLOT = "{}"
+# Trailing sentence punctuation, not part of a slot value
+TRAILING_PUNCTUATION = ".,;:!?"
+
+# Answers that kill processes or remove things
+DESTRUCTIVE_INTENTS = frozenset(("kill_process", "remove"))
+DESTRUCTIVE_PROGRAMS = frozenset(("kill", "pkill", "killall", "rm", "rmdir", "shred", "dd", "truncate", "mkfs"))
+DESTRUCTIVE_ARGS = frozenset(("remove", "purge", "autoremove", "uninstall", "--remove", "--purge"))
+
+# Package manager name (see PACKAGE_MANAGERS) -> template family
+FAMILIES = {"dpkg": "apt", "apt": "apt", "pacman": "pacman", "pamac": "pamac"}
+
+Intent = namedtuple("Intent", "name phrases commands explanation")
+IntentMatch = namedtuple("IntentMatch", "command explanation confidence source destructive")
+
+# commands maps a template family to a command, "*" applies to every family.
+# {} in a phrase is one word of the query, substituted (quoted) into the command.
+INTENTS = (
+    Intent("disk_free", ("disk usage", "disk space", "free disk space", "disk free", "free space", "filesystem usage"),
+           {"*": "df -h"}, "Shows used and available space on every mounted filesystem in human-readable units."),
+    Intent("directory_size", ("directory size", "folder size", "size directory", "size folder", "disk usage directory",
+                              "disk usage folder", "directory sizes", "folder sizes"),
+           {"*": "du -sh -- * | sort -h"}, "Shows the size of each entry in the current directory, largest last."),
+    Intent("largest_files", ("largest files", "biggest files", "find largest files", "find biggest files"),
+           {"*": "find . -type f -printf '%s\\t%p\\n' | sort -nr | head -n 10"},
+           "Lists the ten largest files below the current directory, size in bytes first."),
+    Intent("memory", ("memory usage", "free memory", "ram usage", "available memory", "free ram"),
+           {"*": "free -h"}, "Shows total, used and available memory and swap in human-readable units."),
+    Intent("open_ports", ("open ports", "listening ports", "list open ports", "list listening ports", "ports listening"),
+           {"*": "ss -tulpn"}, "Lists listening TCP and UDP sockets with the owning process (run with sudo to see every process)."),
+    Intent("ip_address", ("ip address", "ip addresses", "my ip", "local ip"),
+           {"*": "ip -brief address"}, "Shows each network interface with its state and IP addresses."),
+    Intent("processes", ("running processes", "list processes", "process list", "list running processes"),
+           {"*": "ps aux"}, "Lists every running process with its user, CPU and memory usage."),
+    Intent("cpu_hogs", ("cpu usage", "top processes", "processes cpu", "processes using most cpu"),
+           {"*": "ps aux --sort=-%cpu | head -n 15"}, "Lists the processes using the most CPU, busiest first."),
+    Intent("kill_process", ("kill process {}", "kill {}", "stop process {}"),
+           {"*": "pkill {}"}, "Sends SIGTERM to every process whose name matches."),
+    Intent("find_file", ("find file {}", "find file named {}", "search file {}", "locate file {}"),
+           {"*": "find . -name {}"}, "Searches the current directory tree for files with that name."),
+    Intent("list_files", ("list files", "list directory", "list files directory", "list hidden files"),
+           {"*": "ls -la"}, "Lists all files in the current directory, including hidden ones, with details."),
+    Intent("working_directory", ("working directory", "current directory", "pwd"),
+           {"*": "pwd"}, "Prints the current working directory."),
+    Intent("kernel_version", ("kernel version", "kernel release"),
+           {"*": "uname -r"}, "Prints the running kernel's release."),
+    Intent("os_version", ("os version", "linux version", "distribution version", "distro version", "os release"),
+           {"*": "cat /etc/os-release"}, "Shows the distribution name and version."),
+    Intent("uptime", ("uptime", "system uptime", "how long system running"),
+           {"*": "uptime"}, "Shows how long the system has been running and the load averages."),
+    Intent("cpu_info", ("cpu info", "cpu information", "processor info", "cpu details"),
+           {"*": "lscpu"}, "Shows the CPU model, cores, threads and caches."),
+    Intent("disks", ("list disks", "list drives", "block devices", "list partitions"),
+           {"*": "lsblk"}, "Lists disks and partitions with their sizes and mount points."),
+    Intent("usb_devices", ("usb devices", "list usb devices"),
+           {"*": "lsusb"}, "Lists connected USB devices."),
+    Intent("services", ("running services", "list services", "list running services"),
+           {"*": "systemctl list-units --type=service --state=running"}, "Lists the systemd services that are running."),
+    Intent("logs", ("system logs", "recent logs", "journal logs"),
+           {"*": "journalctl -n 100 --no-pager"}, "Shows the last 100 lines of the system journal."),
+    Intent("logged_in", ("logged users", "logged in users", "who logged"),
+           {"*": "who"}, "Lists the users currently logged in."),
+    Intent("install", ("install {}", "install package {}"),
+           {"apt": "sudo apt install {}", "pacman": "sudo pacman -S {}", "pamac": "pamac install {}"},
+           "Installs the package with the system package manager."),
+    Intent("remove", ("remove {}", "uninstall {}", "remove package {}", "uninstall package {}"),
+           {"apt": "sudo apt remove {}", "pacman": "sudo pacman -R {}", "pamac": "pamac remove {}"},
+           "Removes the package with the system package manager."),
+    Intent("search_package", ("search package {}", "find package {}", "search packages {}"),
+           {"apt": "apt search {}", "pacman": "pacman -Ss {}", "pamac": "pamac search {}"},
+           "Searches the package repositories for matching packages."),
+    Intent("upgrade", ("update packages", "upgrade packages", "update system", "upgrade system", "system update",
+                       "install updates", "install upgrades"),
+           {"apt": "sudo apt update && sudo apt upgrade", "pacman": "sudo pacman -Syu", "pamac": "pamac upgrade"},
+           "Refreshes the package lists and upgrades every installed package."),
+    Intent("installed_packages", ("installed packages", "list installed packages"),
+           {"apt": "apt list --installed", "pacman": "pacman -Q", "pamac": "pamac list --installed"},
+           "Lists every installed package with its version."),
+)
+# What the slot values of an intent must look like
+SLOT_PATTERNS = {
+    "install": PACKAGE_RE, "remove": PACKAGE_RE, "search_package": PACKAGE_RE, "kill_process": PROCESS_RE,
+}
+
+
+def query_words(text):
+    return [word for word in WORD_RE.findall(text.lower()) if word not in STOPWORDS and word not in FILLER]
+
+
+def query_tokens(text):
+    """
+    The query's words paired with the text each was typed as, e.g.
+    ("bashrc", ".bashrc"), so slots are filled with what the user wrote.
+    A quoted phrase stays one token that only a slot can match.
+    """
+    try:
+        parts = shlex.split(text)
+    except ValueError:
+        parts = text.split()
+    tokens = []
+    for part in parts:
+        if any(char.isspace() for char in part):
+            tokens.append((part.lower(), part))
+            continue
+        words = query_words(part)
+        for word in words:
+            tokens.append((word, part.rstrip(TRAILING_PUNCTUATION) if len(words) == 1 else word))
+    return tokens
+
+
+def phrase_words(phrase):
+    # Template phrases drop the same words queries do, keeping slots
+    return [word for word in phrase.split() if word == SLOT or word not in STOPWORDS and word not in FILLER]
+
+
+def is_destructive(name, command):
+    if name in DESTRUCTIVE_INTENTS:
+        return True
+    for program, args in command_stages(command):
+        program = program.rsplit("/", 1)[-1]
+        if program in DESTRUCTIVE_PROGRAMS or DESTRUCTIVE_ARGS.intersection(args):
+            return True
+        # pacman -R, -Rs, -Rns ...
+        if program == "pacman" and any(arg.startswith("-R") for arg in args):
+            return True
+    return False
+
+
+def answer_available(name, slots, command):
+    # Every program in the answer must be installed here, and only installed packages can be removed
+    from .catalog import get_catalog
+    from .executables import installed_executables, missing_executables
+
+    if name == "remove" and slots[0] not in get_catalog():
+        return False
+    return not installed_executables() or not missing_executables(command)
+
+
+def mine_learned_templates(conn):
+    """
+    Count (query, command) pairs in history rows added since the last run into
+    learned_intents. Counts survive history pruning.
+    """
+    last_id = int(get_metadata(conn, "intents_mined_id") or 0)
+    counts = Counter()
+    explanations = {}
+    for row_id, user_input, command, explanation in conn.execute(
+        "SELECT id, user_input, command, explanation FROM command_suggestions WHERE id > ? ORDER BY id", (last_id,)
+    ):
+        last_id = row_id
+        words = query_words(user_input or "")
+        if not words or len(words) > LEARN_MAX_WORDS or not command:
+            continue
+        key = (" ".join(words), command)
+        counts[key] += 1
+        explanations[key] = explanation
+    with conn:
+        conn.executemany('''
+            INSERT INTO learned_intents (phrase, command, explanation, hits) VALUES (?, ?, ?, ?)
+            ON CONFLICT (phrase, command) DO UPDATE SET
+                hits = hits + excluded.hits, explanation = excluded.explanation
+        ''', [(phrase, command, explanations[phrase, command], hits) for (phrase, command), hits in counts.items()])
+        set_metadata(conn, "intents_mined_id", str(last_id))
+
+
+def learned_templates(conn):
+    return conn.execute('''
+        SELECT l.phrase, l.command, l.explanation
+        FROM learned_intents AS l
+        JOIN (SELECT phrase, SUM(hits) AS total FROM learned_intents GROUP BY phrase) AS t ON t.phrase = l.phrase
+        WHERE l.hits >= ? AND l.hits >= ? * t.total
+    ''', (LEARN_MIN_HITS, LEARN_MIN_SHARE)).fetchall()
+
+
+class IntentMatcher:
+    """
+    Word trie over template phrases for one package manager family. Every trie
+    node is a dict of word -> child; the None key holds what a phrase ending
+    there answers with.
+    """
+
+    def __init__(self, family, learned=(), check_installed=True):
+        self.root = {}
+        self.check_installed = check_installed
+        for intent in INTENTS:
+            command = intent.commands.get(family, intent.commands.get("*"))
+            if command is None:
+                continue
+            for phrase in intent.phrases:
+                self.add(phrase_words(phrase), (intent.name, command, intent.explanation, "template"))
+        for phrase, command, explanation in learned:
+            self.add(phrase.split(), (None, command, explanation, "learned"))
+
+    def add(self, words, answer):
+        node = self.root
+        for word in words:
+            node = node.setdefault(word, {})
+        node.setdefault(None, answer)
+
+    def walk(self, tokens, start):
+        # Yields (end, slot values, answer) for every phrase matching tokens[start:]
+        frontier = [(self.root, start, [])]
+        while frontier:
+            node, position, slots = frontier.pop()
+            if None in node:
+                yield position, slots, node[None]
+            if position == len(tokens):
+                continue
+            word, typed = tokens[position]
+            if word in node:
+                frontier.append((node[word], position + 1, slots))
+            if SLOT in node and word not in DESCRIPTIVE:
+                frontier.append((node[SLOT], position + 1, slots + [typed]))
+
+    def match(self, user_input):
+        """
+        Best IntentMatch for the query, or None. Confidence is the share of the
+        query's words the phrase accounts for, learned phrases winning ties.
+        A phrase with slots must match the whole query, and its slot words
+        count for neither side.
+        """
+        tokens = query_tokens(user_input)
+        if not tokens:
+            return None
+        best = None
+        for start in range(len(tokens)):
+            for end, slots, (name, command, explanation, source) in self.walk(tokens, start):
+                if slots and (start, end) != (0, len(tokens)):
+                    continue
+                if name in SLOT_PATTERNS and not all(SLOT_PATTERNS[name].match(slot) for slot in slots):
+                    continue
+                confidence = (end - start - len(slots)) / (len(tokens) - len(slots))
+                rank = (confidence, source == "learned", -len(slots))
+                if best is None or rank > best[0]:
+                    filled = command.format(*map(shlex.quote, slots)) if slots else command
+                    match = IntentMatch(filled, explanation, confidence, source, is_destructive(name, filled))
+                    best = (rank, name, slots, match)
+        if best is None:
+            return None
+        if self.check_installed and not answer_available(best[1], best[2], best[3].command):
+            return None
+        return best[3]
+
+
+def build_matcher(package_manager, local=True):
+    """
+    Matcher for the package manager's template family. With local, learned
+    templates are added and answers must use programs installed here.
+    """
+    from .inventory import package_manager_name
+
+    family = FAMILIES.get(package_manager_name(package_manager), "apt")
+    learned = ()
+    if local:
+        conn = get_connection()
+        mine_learned_templates(conn)
+        learned = learned_templates(conn)
+    return IntentMatcher(family, learned, check_installed=local)
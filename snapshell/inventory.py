@@ -0,0 +1,233 @@
+# inventory.py
+# Package snapshots from other hosts, for build farms sharing one knowledge base.
+import hashlib
+import itertools
+import json
+import os
+import re
+import socket
+import sqlite3
+import time
+from .db import get_connection
+from .package_managers.readers import read_dpkg_status, read_pacman_local
+from .search import build_match_expression, tokenize
+
+SNAPSHOT_FORMAT = "snapshell-inventory"
+SNAPSHOT_VERSION = 1
+# Packages written per executemany while importing, keeps memory flat for big snapshots
+IMPORT_CHUNK = 1000
+# bm25 column weights for (tool_name, description)
+BM25_WEIGHTS = (10.0, 2.0)
+# Passed as the host to search every imported host at once
+FLEET = "*"
+
+
+def package_manager_name(package_manager):
+    from .package_managers import PACKAGE_MANAGERS
+
+    for name, package_manager_class in PACKAGE_MANAGERS.items():
+        if type(package_manager) is package_manager_class:
+            return name
+    return type(package_manager).__name__
+
+
+def export_inventory(output, host=None):
+    """
+    Write this machine's installed packages as a JSON snapshot for
+    --import-inventory elsewhere, one package per line as they are read.
+    """
+    from .utils import get_package_manager
+
+    package_manager = get_package_manager()
+    header = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "host": host or socket.gethostname(),
+        "package_manager": package_manager_name(package_manager),
+        "exported_at": time.time(),
+    }
+    output.write(json.dumps(header)[:-1] + ', "packages": [\n')
+    count = 0
+    for package in package_manager.iter_installed_packages():
+        if count:
+            output.write(",\n")
+        output.write(json.dumps({
+            "name": package["name"],
+            "version": package["version"],
+            "description": package.get("description", ""),
+            "depends_on": list(package.get("depends_on", [])),
+        }))
+        count += 1
+    output.write("\n]}\n")
+    return count
+
+
+def read_pacman_query(path):
+    # `pacman -Q` output, "name version" per line, carries no descriptions
+    with open(path, encoding="utf-8", errors="replace") as query_file:
+        for line in query_file:
+            parts = line.split()
+            if len(parts) >= 2:
+                yield {"name": parts[0], "version": parts[1], "description": "", "depends_on": []}
+
+
+def read_snapshot(path, host=None):
+    """
+    Detect the snapshot format at path and return (host, package_manager,
+    packages). Understands --export-inventory JSON, a dpkg status file, a pacman
+    local directory and `pacman -Q` output. The host defaults to the one named in
+    the JSON, else the file name, or the directory name for files named status/local.
+    """
+    path = path.rstrip(os.sep)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if stem in ("status", "local", "desc"):
+        stem = os.path.basename(os.path.dirname(os.path.abspath(path))) or stem
+
+    if os.path.isdir(path):
+        return host or stem, "pacman", read_pacman_local(path)
+    with open(path, encoding="utf-8", errors="replace") as snapshot_file:
+        head = snapshot_file.read(4096)
+    if head.lstrip().startswith("{"):
+        with open(path, encoding="utf-8") as snapshot_file:
+            snapshot = json.load(snapshot_file)
+        if snapshot.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"{path} is not a snapshell inventory snapshot")
+        return host or snapshot.get("host") or stem, snapshot.get("package_manager"), snapshot["packages"]
+    if re.search(r"^Package:", head, re.MULTILINE):
+        return host or stem, "dpkg", read_dpkg_status(path)
+    return host or stem, "pacman", read_pacman_query(path)
+
+
+def package_digest(name, version, description, depends_on):
+    return hashlib.blake2b("\0".join((name, version, description, depends_on)).encode("utf-8"), digest_size=16).digest()
+
+
+def build_rows(packages):
+    for package in packages:
+        description = package.get("description") or ""
+        depends_on = ", ".join(package.get("depends_on", []))
+        version = package.get("version") or ""
+        yield (package_digest(package["name"], version, description, depends_on),
+               package["name"], version, description, depends_on)
+
+
+def import_snapshot(host, package_manager, packages, source=None):
+    """
+    Replace host's package set with packages in one transaction. Builds and
+    descriptions already stored for other hosts are reused. Returns the number
+    of packages recorded for the host.
+    """
+    conn = get_connection()
+    with conn:
+        conn.execute('''
+            INSERT INTO hosts (name, package_manager, source, imported_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (name) DO UPDATE SET
+                package_manager = excluded.package_manager, source = excluded.source, imported_at = excluded.imported_at
+        ''', (host, package_manager, source, time.time()))
+        host_id = conn.execute("SELECT id FROM hosts WHERE name = ?", (host,)).fetchone()[0]
+
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS snapshot_digests (digest BLOB PRIMARY KEY) WITHOUT ROWID")
+        conn.execute("DELETE FROM temp.snapshot_digests")
+        rows = build_rows(packages)
+        while True:
+            chunk = list(itertools.islice(rows, IMPORT_CHUNK))
+            if not chunk:
+                break
+            conn.executemany(
+                "INSERT OR IGNORE INTO package_descriptions (description) VALUES (?)",
+                [(row[3],) for row in chunk if row[3]],
+            )
+            conn.executemany('''
+                INSERT OR IGNORE INTO package_builds (digest, tool_name, version, description_id, depends_on)
+                VALUES (?, ?, ?, (SELECT id FROM package_descriptions WHERE description = ?), ?)
+            ''', chunk)
+            conn.executemany("INSERT OR IGNORE INTO temp.snapshot_digests (digest) VALUES (?)", [(row[0],) for row in chunk])
+
+        conn.execute("DELETE FROM host_packages WHERE host_id = ?", (host_id,))
+        count = conn.execute('''
+            INSERT INTO host_packages (host_id, build_id)
+            SELECT ?, b.id FROM temp.snapshot_digests AS s JOIN package_builds AS b ON b.digest = s.digest
+        ''', (host_id,)).rowcount
+        conn.execute("UPDATE hosts SET package_count = ? WHERE id = ?", (count, host_id))
+        remove_orphans(conn)
+    return count
+
+
+def remove_orphans(conn):
+    # Builds no host has any more, then descriptions no build uses
+    conn.execute('''
+        DELETE FROM package_builds
+        WHERE NOT EXISTS (SELECT 1 FROM host_packages AS h WHERE h.build_id = package_builds.id)
+    ''')
+    conn.execute('''
+        DELETE FROM package_descriptions
+        WHERE NOT EXISTS (SELECT 1 FROM package_builds AS b WHERE b.description_id = package_descriptions.id)
+    ''')
+
+
+def remove_host(host):
+    conn = get_connection()
+    with conn:
+        row = conn.execute("SELECT id FROM hosts WHERE name = ?", (host,)).fetchone()
+        if row is None:
+            return False
+        conn.execute("DELETE FROM host_packages WHERE host_id = ?", (row[0],))
+        conn.execute("DELETE FROM hosts WHERE id = ?", (row[0],))
+        remove_orphans(conn)
+    return True
+
+
+def list_hosts():
+    return get_connection().execute(
+        "SELECT name, package_manager, package_count, imported_at, source FROM hosts ORDER BY name"
+    ).fetchall()
+
+
+def get_host(host):
+    return get_connection().execute(
+        "SELECT name, package_manager, package_count FROM hosts WHERE name = ?", (host,)
+    ).fetchone()
+
+
+def search_inventory(user_input, host=FLEET, limit=30):
+    """
+    Same result shape as search.search_packages, over the packages of one
+    imported host or, with host=FLEET, of every host. Fleet-wide, each package
+    appears once with the best-ranked build's version and a host count.
+    """
+    tokens = tokenize(user_input)
+    if not tokens:
+        return []
+
+    conn = get_connection()
+    scope, params = "", [build_match_expression(tokens)]
+    if host != FLEET:
+        scope = "AND b.id IN (SELECT build_id FROM host_packages WHERE host_id = (SELECT id FROM hosts WHERE name = ?))"
+        params.append(host)
+    try:
+        rows = conn.execute(f'''
+            SELECT b.tool_name, b.version, d.description,
+                   (SELECT COUNT(*) FROM host_packages AS h WHERE h.build_id = b.id)
+            FROM inventory_index
+            JOIN package_builds AS b ON b.id = inventory_index.rowid
+            LEFT JOIN package_descriptions AS d ON d.id = b.description_id
+            WHERE inventory_index MATCH ? {scope}
+            ORDER BY bm25(inventory_index, {", ".join(map(str, BM25_WEIGHTS))})
+            LIMIT ?
+        ''', (*params, limit * 4)).fetchall()
+    except sqlite3.OperationalError:
+        # Without FTS5 only an exact-name lookup is offered
+        rows = conn.execute(f'''
+            SELECT b.tool_name, b.version, d.description,
+                   (SELECT COUNT(*) FROM host_packages AS h WHERE h.build_id = b.id)
+            FROM package_builds AS b LEFT JOIN package_descriptions AS d ON d.id = b.description_id
+            WHERE b.tool_name IN ({", ".join("?" * len(tokens))}) {scope}
+        ''', (*tokens, *params[1:])).fetchall()
+
+    packages = {}
+    for name, version, description, hosts in rows:
+        if name in packages:
+            packages[name]["hosts"] += hosts
+        elif len(packages) < limit:
+            packages[name] = {"name": name, "version": version, "description": description, "hosts": hosts}
+    return list(packages.values())
@@ -1,89 +1,368 @@
 # llm_api.py
-import os
-import json
+import asyncio
 import sqlite3
-from groq import Groq
-from pydantic import BaseModel, Field, ValidationError
-from .package_managers import detect_package_manager
-from .utils import DB_PATH, save_command_suggestion, fetch_system_info , update_database
-
-model = "llama-3.3-70b-versatile"
-
-# Configuration file path
-CONFIG_FILE = os.path.expanduser("~/.snapshell_config.json")
+import threading
+import time
+from pydantic import BaseModel, Field
+from .backends import DEFAULT_MODELS, BackendError, create_backend
+from .config import load_api_key, load_config, save_api_key
+from .metrics import current_span, propagate, span
+from .context import CANDIDATE_POOL, DEFAULT_TOKEN_BUDGET, HISTORY_SHARE, build_context, trim_history
+from .executables import package_executables
+from .intents import MIN_CONFIDENCE, OFFLINE_CONFIDENCE, build_matcher
+from .cache import cache_key, get_cached_suggestion, store_cached_suggestion
+from .search import search_packages
+from .streaming import JSONFieldStream, extract_json_object
+from .utils import save_command_suggestion, update_database, has_packages, get_package_manager
+
+model = DEFAULT_MODELS["suggest"]
+
+# Seconds local retrieval may take before the fallback completion is started speculatively
+RETRIEVAL_HEDGE_SECONDS = 0.25
+# Seconds before a duplicate completion request is raced against a slow one. Off by
+# default, a duplicate doubles the token cost of every slow answer
+COMPLETION_HEDGE_SECONDS = None
+
+_loop = None
+_loop_lock = threading.Lock()
 
 # Data model for LLM to generate
 class CommandSuggestion(BaseModel):
     command: str = Field(description="The suggested Linux command")
     explanation: str = Field(description="Explanation of the suggested command")
 
-# Data model for SQL query validation
-class SQLQuery(BaseModel):
-    query: str = Field(description="The SQL query to be executed")
+def background_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="snapshell-llm", daemon=True).start()
+    return _loop
+
+def record_usage(attributes, usage):
+    attributes["prompt_tokens"] = usage.get("prompt_tokens")
+    attributes["completion_tokens"] = usage.get("completion_tokens")
 
 class LLMClient:
     def __init__(self):
         self.API_KEY = self.load_api_key()
-        self.groq = None
-        self.system_info = None
+        self.config = load_config()
+        self.backend = None
+        self.models = {**DEFAULT_MODELS, **self.config.get("models", {})}
         self.package_manager = None
+        # Imported host (or inventory.FLEET) to answer for instead of this machine
+        self.host = None
+        self.context_budget = self.config.get("context_token_budget", DEFAULT_TOKEN_BUDGET)
+        self.retrieval_hedge = self.config.get("retrieval_hedge_seconds", RETRIEVAL_HEDGE_SECONDS)
+        self.completion_hedge = self.config.get("completion_hedge_seconds", COMPLETION_HEDGE_SECONDS)
+        # Check suggestions against the local system and ask for a correction when they fail
+        self.validate = self.config.get("validate_commands", True)
+        # Answer common queries from local templates when they match well enough
+        self.fast_path = self.config.get("fast_path", True)
+        self.fast_path_confidence = self.config.get("fast_path_confidence", MIN_CONFIDENCE)
+        self.intents = None
+        # Named session the REPL is recording into, see sessions.py
+        self.session_id = None
 
     def load_api_key(self):
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, "r") as config_file:
-                config = json.load(config_file)
-            return config.get("GROQ_API_KEY")
-        return None
+        return load_api_key()
     
     def init_client(self):
-        self.groq = Groq(api_key=self.API_KEY)
-        if(not os.path.exists(DB_PATH)):
+        self.backend = create_backend(self.config, self.API_KEY)
+        if(not has_packages()):
             print("Database not found...\nCreating a new database. Please wait...")
             update_database()
-        self.package_manager = detect_package_manager()
-        self.system_info = fetch_system_info()
+        self.package_manager = get_package_manager()
 
     def set_api_key(self, api_key):
         self.API_KEY = api_key
-        config = {"GROQ_API_KEY": api_key}
-        with open(CONFIG_FILE, "w") as config_file:
-            json.dump(config, config_file)
-        self.groq = Groq(api_key=self.API_KEY)
+        save_api_key(api_key)
+        if self.backend is not None:
+            self.backend.close()
+            self.backend = create_backend(self.config, self.API_KEY)
+
+    def set_host(self, host):
+        """
+        Answer for an imported host, or for every imported host with
+        inventory.FLEET, using its package set and package manager.
+        """
+        from .inventory import FLEET, get_host
+        from .package_managers import PACKAGE_MANAGERS
+
+        if host != FLEET:
+            row = get_host(host)
+            if row is None:
+                raise ValueError(f"Unknown host {host!r}. Import its inventory with --import-inventory first.")
+            if row[1] in PACKAGE_MANAGERS:
+                self.package_manager = PACKAGE_MANAGERS[row[1]]()
+        self.host = host
+        self.intents = None
+
+    def check_api_key(self):
+        # Local and stub providers may not need a key
+        if not self.API_KEY and self.config.get("provider", "groq") == "groq":
+            raise ValueError("API key not set. Please set the API key using set_api_key function.")
+
+    def model_for(self, task):
+        # "suggest" answers the user, "analyze" makes the cheap correction after failed validation
+        return self.models.get(task, self.models["suggest"])
+
+    def suggest_command(self, user_input, conversation_history, use_cache=True, on_field=None):
+        with span("suggest", streaming=on_field is not None) as attributes:
+            match = self.match_intent(user_input)
+            if match and match.confidence >= self.fast_path_confidence:
+                attributes["fast_path"] = match.source
+                return self.intent_suggestion(user_input, match, on_field)
+            self.check_api_key()
+
+            key = cache_key(user_input, self.model_for("suggest"), conversation_history, self.host or "")
+            cached = self.cached_suggestion(user_input, key) if use_cache else None
+            attributes["cache_hit"] = cached is not None
+            if cached:
+                if on_field:
+                    on_field("command", cached.command, True)
+                    on_field("explanation", cached.explanation, True)
+                return cached
+
+            # A bypassed lookup still refreshes the cached answer
+            try:
+                suggestion = self.generate_suggestion(user_input, conversation_history, on_field)
+            except BackendError:
+                # Offline, a weaker local match beats no answer unless it kills or removes something
+                if match and not match.destructive and match.confidence >= OFFLINE_CONFIDENCE:
+                    attributes["fast_path"] = "offline"
+                    return self.intent_suggestion(user_input, match, on_field)
+                raise
+            store_cached_suggestion(key, suggestion.command, suggestion.explanation)
+            return suggestion
+
+    async def asuggest_command(self, user_input, conversation_history=(), use_cache=True):
+        """
+        Async counterpart of suggest_command for answering many queries
+        concurrently. Caching stays local and synchronous.
+        """
+        conversation_history = list(conversation_history)
+        with span("suggest", streaming=False) as attributes:
+            match = self.match_intent(user_input)
+            if match and match.confidence >= self.fast_path_confidence:
+                attributes["fast_path"] = match.source
+                return self.intent_suggestion(user_input, match)
+            self.check_api_key()
+
+            key = cache_key(user_input, self.model_for("suggest"), conversation_history, self.host or "")
+            cached = self.cached_suggestion(user_input, key) if use_cache else None
+            attributes["cache_hit"] = cached is not None
+            if cached:
+                return cached
+
+            try:
+                suggestion = await self.agenerate(user_input, conversation_history)
+            except BackendError:
+                if match and not match.destructive and match.confidence >= OFFLINE_CONFIDENCE:
+                    attributes["fast_path"] = "offline"
+                    return self.intent_suggestion(user_input, match)
+                raise
+            save_command_suggestion(user_input, suggestion.command, suggestion.explanation, self.session_id)
+            store_cached_suggestion(key, suggestion.command, suggestion.explanation)
+            return suggestion
+
+    def match_intent(self, user_input):
+        if not self.fast_path or self.package_manager is None:
+            return None
+        if self.intents is None:
+            # Learned templates and installed programs describe this machine, not an imported host
+            self.intents = build_matcher(self.package_manager, local=not self.host)
+        return self.intents.match(user_input)
+
+    def intent_suggestion(self, user_input, match, on_field=None):
+        suggestion = CommandSuggestion(command=match.command, explanation=match.explanation)
+        if on_field:
+            on_field("command", suggestion.command, True)
+            on_field("explanation", suggestion.explanation, True)
+        save_command_suggestion(user_input, suggestion.command, suggestion.explanation, self.session_id)
+        return suggestion
+
+    def cached_suggestion(self, user_input, key):
+        cached = get_cached_suggestion(key)
+        if not cached:
+            return None
+        suggestion = CommandSuggestion(**cached)
+        save_command_suggestion(user_input, suggestion.command, suggestion.explanation, self.session_id)
+        return suggestion
+
+    def generate_suggestion(self, user_input, conversation_history, on_field=None):
+        if on_field is None:
+            suggestion = self.run(self.agenerate(user_input, conversation_history))
+        else:
+            messages, speculative = self.run(self.aprepare(user_input, conversation_history))
+            if speculative is None:
+                suggestion = self.complete(messages, on_field)
+            else:
+                # The fallback answer was already in flight, show it whole
+                suggestion = self.run(self.await_task(speculative))
+                on_field("command", suggestion.command, True)
+                on_field("explanation", suggestion.explanation, True)
+            # Already shown, a correction is printed after it
+            suggestion = self.run(self.avalidate(user_input, suggestion))
+        save_command_suggestion(user_input, suggestion.command, suggestion.explanation, self.session_id)
+        return suggestion
+
+    def run(self, coroutine):
+        # Sync callers share one background event loop, and with it one pooled async HTTP client
+        coroutine = propagate(coroutine, current_span())
+        return asyncio.run_coroutine_threadsafe(coroutine, background_loop()).result()
 
-    def suggest_command(self, user_input, conversation_history):
-        if not self.API_KEY:
-            raise ValueError("API key not set. Please set the API key using set_api_key function.")        
+    async def await_task(self, task):
+        return await task
 
-        # Formulate SQL query using LLM
-        sql_query = self.formulate_sql_query(user_input)
+    async def agenerate(self, user_input, conversation_history):
+        messages, speculative = await self.aprepare(user_input, conversation_history)
+        if speculative is not None:
+            suggestion = await speculative
+        else:
+            suggestion = await self.hedged_acomplete(messages)
+        return await self.avalidate(user_input, suggestion)
+
+    async def avalidate(self, user_input, suggestion):
+        """
+        Check the suggestion against this machine and, only when it fails,
+        ask the analyze model once for a targeted fix. The fix is kept if it
+        validates with fewer problems, otherwise the original stands.
+        """
+        from .validate import validate_command
+
+        # An imported host's binaries aren't on this machine
+        if not self.validate or self.host:
+            return suggestion
+        with span("validate") as attributes:
+            problems = await asyncio.to_thread(validate_command, suggestion.command)
+            attributes["problems"] = len(problems)
+        if not problems:
+            return suggestion
 
-        # Validate the SQL query
         try:
-            sql_query_model = SQLQuery(query=sql_query)
-            sql_query = sql_query_model.query
-        except ValidationError as e:
-            # SQL query validation failed, proceed to fallback directly
-            return self.fallback_to_llm(user_input,self.package_manager, "Failed to generate a valid SQL query. Interpreting your query directly.", conversation_history)
+            corrected = await self.acorrect(user_input, suggestion, problems)
+        except (ValueError, BackendError):
+            return suggestion
+        remaining = await asyncio.to_thread(validate_command, corrected.command)
+        return corrected if len(remaining) < len(problems) else suggestion
+
+    async def acorrect(self, user_input, suggestion, problems):
+        model_name = self.model_for("analyze")
+        with span("llm.correct", model=model_name, problems=len(problems)) as attributes:
+            completion = await self.backend.acomplete(self.correction_messages(user_input, suggestion, problems), model_name)
+            record_usage(attributes, completion.usage)
+        return CommandSuggestion.model_validate_json(extract_json_object(completion.content))
+
+    def correction_messages(self, user_input, suggestion, problems):
+        system_prompt = (
+            f"A Linux command was suggested for the request below, but checking it on the user's machine found problems:\n"
+            + "\n".join(f"- {problem}" for problem in problems)
+            + f"\nThe package manager in use is {self.package_manager.__class__.__name__}. "
+            "Fix only these problems, using programs and options that exist on this machine. "
+            "Respond with a JSON object with a \"command\" key holding the corrected command, followed by an \"explanation\" key."
+        )
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_input},
+            {"role": "assistant", "content": suggestion.command},
+        ]
 
-        # Query the database
-        relevant_packages = self.query_database(sql_query)
+    async def aprepare(self, user_input, conversation_history):
+        """
+        Run local retrieval and, if it is slower than the retrieval hedge,
+        start the ungrounded fallback completion alongside it. Returns the
+        messages to send and the fallback task when that branch won, else None.
+        """
+        with span("retrieval") as attributes:
+            retrieval = asyncio.create_task(asyncio.to_thread(self.grounded_messages, user_input, conversation_history))
+            done, _ = await asyncio.wait({retrieval}, timeout=self.retrieval_hedge)
+
+            speculative = None
+            if not done:
+                attributes["speculative"] = True
+                speculative = asyncio.create_task(self.acomplete(self.no_packages_messages(user_input, conversation_history)))
+                # A losing branch's failure is not worth a warning
+                speculative.add_done_callback(lambda task: task.cancelled() or task.exception())
+            try:
+                messages = await retrieval
+            except BaseException:
+                if speculative is not None:
+                    speculative.cancel()
+                raise
+
+            if messages is not None:
+                # Relevant packages were found, the grounded answer wins
+                if speculative is not None:
+                    speculative.cancel()
+                return messages, None
+            attributes["fallback_reason"] = "no_relevant_packages"
+            if speculative is not None:
+                return None, speculative
+            return self.no_packages_messages(user_input, conversation_history), None
+
+    async def hedged_acomplete(self, messages):
+        """
+        Send a second identical request when the first has not answered within
+        the completion hedge, take whichever succeeds first and cancel the other.
+        A first request that is waiting out a rate limit is never duplicated.
+        """
+        first = asyncio.create_task(self.acomplete(messages))
+        if self.completion_hedge is None:
+            return await first
+        done, _ = await asyncio.wait({first}, timeout=self.completion_hedge)
+        if done or self.backend.in_backoff():
+            return await first
+
+        with span("completion.hedge"):
+            return await self.race(first, asyncio.create_task(self.acomplete(messages)))
+
+    async def race(self, *tasks):
+        pending = set(tasks)
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.exception() or not pending:
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def build_messages(self, user_input, conversation_history):
+        messages = self.grounded_messages(user_input, conversation_history)
+        if messages is None:
+            return self.no_packages_messages(user_input, conversation_history)
+        return messages
+
+    def no_packages_messages(self, user_input, conversation_history):
+        # Database has no relevant packages, fall back to LLM interpretation
+        history = trim_history(conversation_history, int(self.context_budget * HISTORY_SHARE))
+        return self.fallback_messages(user_input, self.package_manager, "No relevant packages found in the database.", history)
+
+    def grounded_messages(self, user_input, conversation_history):
+        # Rank installed packages against the query locally
+        with span("search") as attributes:
+            candidates = self.query_database(user_input)
+            attributes["candidates"] = len(candidates)
+
+        # Pack the best packages and the recent conversation into the token budget
+        with span("context") as attributes:
+            package_lines, history = build_context(user_input, conversation_history, candidates, self.context_budget)
+            attributes["package_lines"] = len(package_lines)
 
         # Check if the database is empty or no results were found
-        if not relevant_packages:
-            # Database has no relevant packages, fall back to LLM interpretation
-            return self.fallback_to_llm(user_input, self.package_manager, "No relevant packages found in the database.", conversation_history)
+        if not package_lines:
+            return None
 
         # If relevant packages are found, format them for LLM
-        relevant_packages_str = "\n".join([
-            f"{pkg['name']}: {pkg['version']}, Description: {pkg.get('description', 'No description available')}"
-            for pkg in relevant_packages
-        ])
+        relevant_packages_str = "\n".join(package_lines)
 
         system_prompt = (
             f"You are a helpful assistant that suggests Linux commands based on the following system info:\n"
             f"Relevant Installed Packages:\n{relevant_packages_str}\n"
             f"The package manager in use is {self.package_manager.__class__.__name__}. "
-            "Please respond with a JSON object containing the suggested command and an explanation. "
+            "Please respond with a JSON object with a \"command\" key holding the suggested command, followed by an \"explanation\" key. "
             "Ensure the response is relevant to the user's query and provides accurate information."
         )
 
@@ -92,32 +371,17 @@ class LLMClient:
         ]
 
         # Add conversation history to messages
-        messages.extend(conversation_history)
+        messages.extend(history)
 
         messages.append({"role": "user", "content": user_input})
+        return messages
 
-        chat_completion = self.groq.chat.completions.create(
-            messages=messages,
-            model=model,
-            temperature=0,
-            stream=False,
-            response_format={"type": "json_object"},
-        )
-
-        suggestion = CommandSuggestion.model_validate_json(chat_completion.choices[0].message.content)
-        save_command_suggestion(user_input, suggestion.command, suggestion.explanation)
-        return suggestion
-
-    def fallback_to_llm(self, user_input, package_manager, fallback_message, conversation_history):
-        """
-        This function acts as a fallback to interpret the user query directly
-        if SQL queries or database lookups don't provide relevant information.
-        """
+    def fallback_messages(self, user_input, package_manager, fallback_message, conversation_history):
         system_prompt = (
             f"{fallback_message}\n"
             f"The package manager in use is {package_manager.__class__.__name__}. "
             "Please suggest the most appropriate Linux command based on the user's query, system information, and package manager."
-            "Respond with a JSON object containing the suggested command and an explanation."
+            "Respond with a JSON object with a \"command\" key holding the suggested command, followed by an \"explanation\" key."
         )
 
         messages = [
@@ -128,72 +392,49 @@ class LLMClient:
         messages.extend(conversation_history)
 
         messages.append({"role": "user", "content": user_input})
-
-        chat_completion = self.groq.chat.completions.create(
-            messages=messages,
-            model=model,
-            temperature=0,
-            stream=False,
-            response_format={"type": "json_object"},
-        )
-
-        suggestion = CommandSuggestion.model_validate_json(chat_completion.choices[0].message.content)
-        save_command_suggestion(user_input, suggestion.command, suggestion.explanation)
-        return suggestion
-
-    def formulate_sql_query(self, user_input):
-        system_prompt = (
-        "You are a helpful assistant that generates SQL queries based on user input. "
-        "Please generate a valid SQL query to fetch relevant packages from the system_config table. "
-        "The SQL query should be in the following format: "
-        "SELECT tool_name, version, description FROM system_config WHERE tool_name LIKE '%keyword%'; "
-        "Replace 'keyword' with the relevant keyword from the user input. "
-        "User input will be a natural language question with a command related to the system. Your query will help fetch the relevant packages. "
-        "Output should be in JSON format."
-    )
-
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_input},
-        ]
-
-        chat_completion = self.groq.chat.completions.create(
-            messages=messages,
-            model=model,
-            temperature=0,
-            stream=False,
-            response_format={"type": "json_object"},
-        )
-
-        llm_response = chat_completion.choices[0].message.content
-
-        # Extract the SQL query from the LLM response using Pydantic model
-        try:
-            llm_response_model = SQLQuery.model_validate_json(llm_response)
-            query = llm_response_model.query
-
-        except ValidationError as e:
-            query = ""
-
-        return query
-
-    def query_database(self, sql_query):
+        return messages
+
+    def complete(self, messages, on_field=None):
+        model_name = self.model_for("suggest")
+        if on_field is None:
+            with span("llm.complete", model=model_name) as attributes:
+                completion = self.backend.complete(messages, model_name)
+                record_usage(attributes, completion.usage)
+            return CommandSuggestion.model_validate_json(completion.content)
+
+        parser = JSONFieldStream()
+        content = []
+        with span("llm.stream", model=model_name) as attributes:
+            usage = {}
+            start = time.perf_counter()
+            for delta in self.backend.stream(messages, model_name, usage):
+                if not content:
+                    attributes["first_token_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                content.append(delta)
+                for field, text, done in parser.feed(delta):
+                    on_field(field, text, done)
+            record_usage(attributes, usage)
+
+        return CommandSuggestion.model_validate_json(extract_json_object("".join(content)))
+
+    async def acomplete(self, messages):
+        model_name = self.model_for("suggest")
+        with span("llm.complete", model=model_name) as attributes:
+            completion = await self.backend.acomplete(messages, model_name)
+            record_usage(attributes, completion.usage)
+        return CommandSuggestion.model_validate_json(completion.content)
+
+    def query_database(self, user_input):
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute(sql_query)
-            results = cursor.fetchmany(30)  # Fetch only the first 30 results
-            conn.close()
-
-            relevant_packages = [
-                {
-                    "name": pkg[0],
-                    "version": pkg[1],
-                    "description": pkg[2],
-                }
-                for pkg in results
-            ]
-            return relevant_packages
+            if self.host:
+                from .inventory import search_inventory
+                return search_inventory(user_input, self.host, limit=CANDIDATE_POOL)
+            candidates = search_packages(user_input, limit=CANDIDATE_POOL)
+            # Name the executables each package ships, so the model picks commands that exist here
+            commands = package_executables([pkg["name"] for pkg in candidates])
+            for pkg in candidates:
+                pkg["commands"] = commands.get(pkg["name"], [])
+            return candidates
         except sqlite3.Error as e:
             # If there's any issue with the database query, return an empty result
             return []
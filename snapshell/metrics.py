@@ -0,0 +1,218 @@
+# metrics.py
+import contextvars
+import json
+import math
+import os
+import queue
+import time
+from contextlib import contextmanager
+from .config import load_config
+from .db import get_connection
+from .history import HistoryWriter
+
+# Spans older than this are pruned as new ones are written
+RETENTION_SECONDS = 30 * 24 * 3600
+PERCENTILES = (50, 95, 99)
+
+# (trace_id, span_id) of the span currently open in this thread or task
+_current = contextvars.ContextVar("snapshell_span", default=None)
+_enabled = None
+
+
+def metrics_enabled():
+    global _enabled
+    if _enabled is None:
+        _enabled = load_config().get("metrics", True)
+    return _enabled
+
+
+def new_id(size):
+    return os.urandom(size).hex()
+
+
+class MetricsWriter(HistoryWriter):
+    """
+    Batches finished spans into the metrics table on a background thread.
+    Unlike history, spans are dropped rather than blocking a full queue.
+    """
+
+    thread_name = "snapshell-metrics"
+    entry_name = "metric spans"
+
+    def submit(self, row):
+        self.start()
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            pass
+
+    def insert(self, batch):
+        conn = get_connection()
+        with conn:
+            conn.executemany('''
+                INSERT INTO metrics (trace_id, span_id, parent_id, stage, started_at, duration_ms, attributes)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', batch)
+            conn.execute("DELETE FROM metrics WHERE started_at < ?", (time.time() - RETENTION_SECONDS,))
+
+
+metrics_writer = MetricsWriter()
+
+
+@contextmanager
+def span(stage, **attributes):
+    """
+    Time the enclosed block as one stage. Yields the attribute dict so the
+    block can attach token counts, cache hits and the like before it closes.
+    Nested spans share the trace of the outermost one.
+    """
+    if not metrics_enabled():
+        yield attributes
+        return
+
+    parent = _current.get()
+    trace_id = parent[0] if parent else new_id(16)
+    span_id = new_id(8)
+    token = _current.set((trace_id, span_id))
+    started_at = time.time()
+    start = time.perf_counter()
+    try:
+        yield attributes
+    except BaseException as e:
+        attributes["error"] = type(e).__name__
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        _current.reset(token)
+        submit_span(trace_id, span_id, parent, stage, started_at, duration_ms, attributes)
+
+
+def record_span(stage, duration_ms, **attributes):
+    """
+    Record a stage whose time was added up across interleaved work, such as
+    reading packages between database writes, as a child of the open span.
+    """
+    if not metrics_enabled():
+        return
+    parent = _current.get()
+    submit_span(parent[0] if parent else new_id(16), new_id(8), parent, stage,
+                time.time() - duration_ms / 1000, duration_ms, attributes)
+
+
+def submit_span(trace_id, span_id, parent, stage, started_at, duration_ms, attributes):
+    metrics_writer.submit((
+        trace_id, span_id, parent[1] if parent else None, stage, started_at, duration_ms,
+        json.dumps({key: value for key, value in attributes.items() if value is not None}),
+    ))
+
+
+async def propagate(coroutine, parent):
+    # Carry the caller's span into a coroutine run on another thread's event loop
+    _current.set(parent)
+    return await coroutine
+
+
+def current_span():
+    return _current.get()
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile
+    return sorted_values[max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)]
+
+
+def collect_stats(since=None):
+    metrics_writer.flush()
+    conn = get_connection()
+    since = since if since is not None else 0
+    durations = {}
+    counters = {"suggestions": 0, "cache_hits": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    fallback_reasons = {}
+    rows = conn.execute(
+        "SELECT stage, duration_ms, attributes FROM metrics WHERE started_at >= ? ORDER BY duration_ms", (since,)
+    )
+    for stage, duration_ms, attributes in rows:
+        durations.setdefault(stage, []).append(duration_ms)
+        attributes = json.loads(attributes or "{}")
+        if stage == "suggest":
+            counters["suggestions"] += 1
+            counters["cache_hits"] += bool(attributes.get("cache_hit"))
+        reason = attributes.get("fallback_reason")
+        if reason:
+            fallback_reasons[reason] = fallback_reasons.get(reason, 0) + 1
+        counters["prompt_tokens"] += attributes.get("prompt_tokens", 0)
+        counters["completion_tokens"] += attributes.get("completion_tokens", 0)
+
+    stages = {
+        stage: {"count": len(values), **{f"p{pct}": percentile(values, pct) for pct in PERCENTILES}}
+        for stage, values in durations.items()
+    }
+    return {"stages": stages, "counters": counters, "fallback_reasons": fallback_reasons}
+
+
+def print_stats():
+    from .utils import print_color
+
+    stats = collect_stats()
+    if not stats["stages"]:
+        print_color("No metrics recorded yet.", "YELLOW")
+        return
+
+    print_color(f"{'Stage':<24}{'Count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}", "CYAN")
+    for stage in sorted(stats["stages"]):
+        row = stats["stages"][stage]
+        print(f"{stage:<24}{row['count']:>8}{row['p50']:>10.1f}{row['p95']:>10.1f}{row['p99']:>10.1f}")
+
+    counters = stats["counters"]
+    if counters["suggestions"]:
+        hit_rate = counters["cache_hits"] / counters["suggestions"]
+        print_color(f"\nSuggestions: {counters['suggestions']} ({hit_rate:.0%} from cache)", "GREEN")
+    print_color(f"Tokens: {counters['prompt_tokens']} prompt, {counters['completion_tokens']} completion", "GREEN")
+    for reason, count in sorted(stats["fallback_reasons"].items()):
+        print_color(f"Fallback ({reason}): {count}", "YELLOW")
+
+
+def otel_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def iter_otel_spans(since=None):
+    metrics_writer.flush()
+    rows = get_connection().execute('''
+        SELECT trace_id, span_id, parent_id, stage, started_at, duration_ms, attributes
+        FROM metrics WHERE started_at >= ? ORDER BY started_at
+    ''', (since or 0,))
+    for trace_id, span_id, parent_id, stage, started_at, duration_ms, attributes in rows:
+        start_ns = int(started_at * 1e9)
+        yield {
+            "traceId": trace_id,
+            "spanId": span_id,
+            "parentSpanId": parent_id or "",
+            "name": stage,
+            "startTimeUnixNano": str(start_ns),
+            "endTimeUnixNano": str(start_ns + int(duration_ms * 1e6)),
+            "attributes": [
+                {"key": key, "value": otel_value(value)} for key, value in json.loads(attributes or "{}").items()
+            ],
+        }
+
+
+def export_otel(output, since=None):
+    """
+    Write recorded spans in the OpenTelemetry OTLP/JSON trace layout, which
+    collectors and trace viewers can import directly.
+    """
+    document = {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "snapshell"}}]},
+            "scopeSpans": [{"scope": {"name": "snapshell"}, "spans": list(iter_otel_spans(since))}],
+        }]
+    }
+    json.dump(document, output)
+    output.write("\n")
@@ -1,33 +1,29 @@
-import subprocess
+import functools
+import shutil
 from .base_package_manager import BasePackageManager
 from .dpkg_package_manager import DpkgPackageManager
 from .apt_package_manager import AptPackageManager
 from .pacman_package_manager import PacmanPackageManager
 from .pamac_package_manager import PamacPackageManager
 
-def detect_package_manager():
-    try:
-        subprocess.check_output(['dpkg', '--version'])
-        return DpkgPackageManager()
-    except FileNotFoundError:
-        pass
-
-    try:
-        subprocess.check_output(['apt', '--version'])
-        return AptPackageManager()
-    except FileNotFoundError:
-        pass
+# Probed in this order, keyed by the binary that identifies each one
+PACKAGE_MANAGERS = {
+    'dpkg': DpkgPackageManager,
+    'apt': AptPackageManager,
+    'pacman': PacmanPackageManager,
+    'pamac': PamacPackageManager,
+}
 
-    try:
-        subprocess.check_output(['pacman', '--version'])
-        return PacmanPackageManager()
-    except FileNotFoundError:
-        pass
+def package_manager_for(name):
+    # Rebuild a previously detected manager if its binary is still installed
+    if name in PACKAGE_MANAGERS and shutil.which(name):
+        return PACKAGE_MANAGERS[name]()
+    return None
 
-    try:
-        subprocess.check_output(['pamac', '--version'])
-        return PamacPackageManager()
-    except FileNotFoundError:
-        pass
+@functools.lru_cache(maxsize=None)
+def detect_package_manager():
+    for name, package_manager_class in PACKAGE_MANAGERS.items():
+        if shutil.which(name):
+            return package_manager_class()
 
-    raise Exception("No supported package manager found")
\ No newline at end of file
+    raise Exception("No supported package manager found")
@@ -1,31 +1,28 @@
 import subprocess
 from .base_package_manager import BasePackageManager
+from .pipeline import run_batched
+from .readers import parse_apt_cache_show, read_dpkg_file_lists, read_dpkg_status
 
 class AptPackageManager(BasePackageManager):
-    def get_installed_packages(self):
-        # Get the list of installed packages
-        installed_packages = subprocess.check_output(['apt', 'list', '--installed']).decode('utf-8').splitlines()
-        package_names = [line.split('/')[0] for line in installed_packages[1:]]  # Skip headers
-        
-        # Get detailed information for all packages in one call
-        package_info = subprocess.check_output(['apt-cache', 'show'] + package_names).decode('utf-8').splitlines()
-        
-        packages = []
-        current_package = {}
-        for line in package_info:
-            if line.startswith('Package'):
-                if current_package:
-                    packages.append(current_package)
-                current_package = {'name': line.split(':', 1)[1].strip()}
-            elif line.startswith('Version'):
-                current_package['version'] = line.split(':', 1)[1].strip()
-            elif line.startswith('Description'):
-                current_package['description'] = line.split(':', 1)[1].strip()
-            elif line.startswith('Depends'):
-                depends_on = line.split(':', 1)[1].strip()
-                current_package['depends_on'] = depends_on.split(', ') if depends_on else []
-        
-        if current_package:
-            packages.append(current_package)
-        
-        return packages
\ No newline at end of file
+    state_paths = ('/var/lib/dpkg/status',)
+
+    def read_package_database(self):
+        return read_dpkg_status()
+
+    def read_file_lists(self):
+        return read_dpkg_file_lists()
+
+    def query_installed_packages(self):
+        # Lines look like "name/suite,now 1.2-3 amd64 [installed]" after a "Listing..." header
+        installed_packages = subprocess.check_output(['apt', 'list', '--installed'], stderr=subprocess.DEVNULL).decode('utf-8').splitlines()
+        installed_versions = {}
+        for line in installed_packages[1:]:
+            parts = line.split()
+            if len(parts) >= 2:
+                installed_versions[parts[0].split('/')[0]] = parts[1]
+
+        # Details come from apt-cache show, in parallel argv-safe batches
+        return run_batched(
+            ['apt-cache', 'show'], list(installed_versions),
+            lambda lines: parse_apt_cache_show(lines, installed_versions),
+        )
@@ -1,6 +1,40 @@
+import os
 from abc import ABC, abstractmethod
 
 class BasePackageManager(ABC):
+    # Files or directories whose mtime/size change whenever packages change
+    state_paths = ()
+
     @abstractmethod
+    def query_installed_packages(self):
+        # Ask the package manager's own tools, used when its database can't be read directly.
+        # Returns an iterable of package dicts; generators let update_database stream them
+        pass
+
+    def read_package_database(self):
+        return None
+
+    def read_file_lists(self):
+        # (package, path) pairs for installed files, None when unavailable
+        return None
+
+    def iter_installed_packages(self):
+        if self.state_paths and all(os.access(path, os.R_OK) for path in self.state_paths):
+            packages = self.read_package_database()
+            if packages is not None:
+                return packages
+        # Lazy, the caller times consuming it (update_database records packages.read)
+        return iter(self.query_installed_packages())
+
     def get_installed_packages(self):
-        pass
\ No newline at end of file
+        return list(self.iter_installed_packages())
+
+    def fingerprint(self):
+        parts = []
+        for path in self.state_paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            parts.append(f"{path}:{stat.st_mtime_ns}:{stat.st_size}")
+        return "|".join(parts) or None
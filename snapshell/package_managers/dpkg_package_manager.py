@@ -1,25 +1,38 @@
 import subprocess
 from .base_package_manager import BasePackageManager
+from .pipeline import run_batched
+from .readers import read_dpkg_file_lists, read_dpkg_status
+
+# ${binary:Summary} is the one-line synopsis, tabs keep multi-word fields intact
+DPKG_QUERY_FORMAT = '-f=${Package}\t${Version}\t${binary:Summary}\t${Depends}\n'
+
+
+def parse_dpkg_query(lines):
+    for line in lines:
+        parts = line.split('\t', 3)
+        if len(parts) >= 4:
+            name, version, description, depends_on = parts[0], parts[1], parts[2], parts[3]
+            yield {
+                'name': name,
+                'version': version,
+                'description': description,
+                'depends_on': depends_on.split(', ') if depends_on else []
+            }
+
 
 class DpkgPackageManager(BasePackageManager):
-    def get_installed_packages(self):
+    state_paths = ('/var/lib/dpkg/status',)
+
+    def read_package_database(self):
+        return read_dpkg_status()
+
+    def read_file_lists(self):
+        return read_dpkg_file_lists()
+
+    def query_installed_packages(self):
         # Get the list of installed packages
         installed_packages = subprocess.check_output(['dpkg', '-l']).decode('utf-8').splitlines()
         package_names = [line.split()[1] for line in installed_packages[5:] if len(line.split()) >= 3]
-        
-        # Get detailed information for all packages in one call
-        package_info = subprocess.check_output(['dpkg-query', '-W', '-f=${Package} ${Version} ${Description} ${Depends}\n'] + package_names).decode('utf-8').splitlines()
-        
-        packages = []
-        for line in package_info:
-            parts = line.split(' ', 3)
-            if len(parts) >= 4:
-                name, version, description, depends_on = parts[0], parts[1], parts[2], parts[3]
-                packages.append({
-                    'name': name,
-                    'version': version,
-                    'description': description,
-                    'depends_on': depends_on.split(', ') if depends_on else []
-                })
-        
-        return packages
+
+        # Details come from dpkg-query, in parallel argv-safe batches
+        return run_batched(['dpkg-query', '-W', DPKG_QUERY_FORMAT], package_names, parse_dpkg_query)
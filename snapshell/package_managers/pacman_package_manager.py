@@ -1,31 +1,20 @@
 import subprocess
 from .base_package_manager import BasePackageManager
+from .pipeline import run_batched
+from .readers import parse_pacman_info, read_pacman_files, read_pacman_local
 
 class PacmanPackageManager(BasePackageManager):
-    def get_installed_packages(self):
+    state_paths = ('/var/lib/pacman/local',)
+
+    def read_package_database(self):
+        return read_pacman_local()
+
+    def read_file_lists(self):
+        return read_pacman_files()
+
+    def query_installed_packages(self):
         # Get the list of installed packages
-        installed_packages = subprocess.check_output(['pacman', '-Q']).decode('utf-8').splitlines()
-        package_names = [line.split()[0] for line in installed_packages]
-        
-        # Get detailed information for all packages in one call
-        package_info = subprocess.check_output(['pacman', '-Qi'] + package_names).decode('utf-8').splitlines()
-        
-        packages = []
-        current_package = {}
-        for line in package_info:
-            if line.startswith('Name'):
-                if current_package:
-                    packages.append(current_package)
-                current_package = {'name': line.split(':', 1)[1].strip()}
-            elif line.startswith('Version'):
-                current_package['version'] = line.split(':', 1)[1].strip()
-            elif line.startswith('Description'):
-                current_package['description'] = line.split(':', 1)[1].strip()
-            elif line.startswith('Depends On'):
-                depends_on = line.split(':', 1)[1].strip()
-                current_package['depends_on'] = depends_on.split() if depends_on != 'None' else []
-        
-        if current_package:
-            packages.append(current_package)
-        
-        return packages
\ No newline at end of file
+        package_names = subprocess.check_output(['pacman', '-Qq']).decode('utf-8').split()
+
+        # Details come from pacman -Qi, in parallel argv-safe batches
+        return run_batched(['pacman', '-Qi'], package_names, parse_pacman_info)
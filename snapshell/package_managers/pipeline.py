@@ -0,0 +1,64 @@
+import itertools
+import os
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Bytes of package names per command line, far below ARG_MAX so batches never fail
+ARGV_BYTES = 64 * 1024
+# Names per batch, small enough that several batches run in parallel
+BATCH_NAMES = 256
+WORKERS = min(8, os.cpu_count() or 1)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def argv_batches(names, max_bytes=ARGV_BYTES, max_names=BATCH_NAMES):
+    batch, size = [], 0
+    for name in names:
+        if batch and (size + len(name) + 1 > max_bytes or len(batch) >= max_names):
+            yield batch
+            batch, size = [], 0
+        batch.append(name)
+        size += len(name) + 1
+    if batch:
+        yield batch
+
+
+def ordered_map(function, items, workers=WORKERS):
+    """
+    Like executor.map, but keeps at most 2 * workers items in flight so results
+    are produced as they are consumed instead of piling up in memory.
+    """
+    if workers <= 1:
+        yield from map(function, items)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def run_batched(command, names, parse, workers=WORKERS):
+    """
+    Run `command + batch` for argv-safe batches of names in parallel and
+    yield the records parse() extracts from each batch's output, in order.
+    """
+    def run(batch):
+        # Some tools exit non-zero when one name is unknown but still print the rest
+        result = subprocess.run(command + batch, capture_output=True, text=True, errors='replace')
+        return list(parse(result.stdout.splitlines()))
+
+    for records in ordered_map(run, argv_batches(names), workers):
+        yield from records
@@ -0,0 +1,162 @@
+import os
+from .pipeline import chunked, ordered_map
+
+DPKG_STATUS_PATH = '/var/lib/dpkg/status'
+DPKG_INFO_PATH = '/var/lib/dpkg/info'
+PACMAN_LOCAL_PATH = '/var/lib/pacman/local'
+# desc files read per worker task
+PACMAN_CHUNK = 128
+
+
+def iter_deb822_stanzas(lines):
+    # RFC822-style stanzas: "Field: value", continuation lines start with whitespace.
+    # Also reads `pacman -Qi` output, whose field names are padded with spaces
+    stanza = {}
+    field = None
+    for line in lines:
+        line = line.rstrip('\n')
+        if not line.strip():
+            if stanza:
+                yield stanza
+            stanza, field = {}, None
+        elif line[0] in ' \t':
+            if field:
+                stanza[field] += '\n' + line.strip()
+        else:
+            field, _, value = line.partition(':')
+            field = field.strip()
+            stanza[field] = value.strip()
+    if stanza:
+        yield stanza
+
+
+def split_depends(value, separator):
+    return [dep.strip() for dep in value.replace('\n', ' ').split(separator) if dep.strip()]
+
+
+def read_dpkg_status(path=DPKG_STATUS_PATH):
+    with open(path, encoding='utf-8', errors='replace') as status_file:
+        for stanza in iter_deb822_stanzas(status_file):
+            # Skip removed packages whose config files are still around
+            if not stanza.get('Status', '').endswith(' installed'):
+                continue
+            yield {
+                'name': stanza['Package'],
+                'version': stanza.get('Version', ''),
+                # First line is the synopsis, the rest is the extended description
+                'description': stanza.get('Description', '').split('\n', 1)[0],
+                'depends_on': split_depends(stanza.get('Depends', ''), ','),
+            }
+
+
+def parse_pacman_desc(desc_file):
+    sections = {}
+    key = None
+    for line in desc_file:
+        line = line.strip()
+        if line.startswith('%') and line.endswith('%'):
+            key = line.strip('%')
+            sections[key] = []
+        elif line and key:
+            sections[key].append(line)
+    return sections
+
+
+def read_pacman_desc(desc_path):
+    try:
+        with open(desc_path, encoding='utf-8', errors='replace') as desc_file:
+            sections = parse_pacman_desc(desc_file)
+    except FileNotFoundError:
+        return None
+    if not sections.get('NAME'):
+        return None
+    return {
+        'name': sections['NAME'][0],
+        'version': ' '.join(sections.get('VERSION', [])),
+        'description': ' '.join(sections.get('DESC', [])),
+        'depends_on': sections.get('DEPENDS', []),
+    }
+
+
+def read_pacman_local(path=PACMAN_LOCAL_PATH):
+    # One small file per package, so the reads are spread over a thread pool
+    def read_chunk(desc_paths):
+        return [package for package in map(read_pacman_desc, desc_paths) if package]
+
+    with os.scandir(path) as entries:
+        desc_paths = (os.path.join(entry.path, 'desc') for entry in entries if entry.is_dir())
+        for packages in ordered_map(read_chunk, chunked(desc_paths, PACMAN_CHUNK)):
+            yield from packages
+
+
+def read_dpkg_file_lists(info_path=DPKG_INFO_PATH):
+    # (package, path) for every file a package installed, from <name>[:arch].list
+    with os.scandir(info_path) as entries:
+        list_paths = [entry.path for entry in entries if entry.name.endswith('.list')]
+    for list_path in list_paths:
+        package = os.path.basename(list_path)[:-len('.list')].split(':', 1)[0]
+        try:
+            with open(list_path, encoding='utf-8', errors='replace') as list_file:
+                for line in list_file:
+                    yield package, line.rstrip('\n')
+        except FileNotFoundError:
+            continue
+
+
+def read_pacman_files(path=PACMAN_LOCAL_PATH):
+    # Each package directory is <name>-<pkgver>-<pkgrel>, its files entry lists
+    # paths relative to / under %FILES%
+    with os.scandir(path) as entries:
+        package_dirs = [entry for entry in entries if entry.is_dir()]
+    for package_dir in package_dirs:
+        package = package_dir.name.rsplit('-', 2)[0]
+        try:
+            with open(os.path.join(package_dir.path, 'files'), encoding='utf-8', errors='replace') as files_file:
+                sections = parse_pacman_desc(files_file)
+        except FileNotFoundError:
+            continue
+        for file_path in sections.get('FILES', []):
+            yield package, '/' + file_path
+
+
+def parse_apt_cache_show(lines, installed_versions):
+    # apt-cache show prints every known version, keep the installed one or
+    # the first listed when the installed version is no longer in the archive
+    first = {}
+    matched = set()
+    for stanza in iter_deb822_stanzas(lines):
+        name = stanza.get('Package')
+        if name not in installed_versions or name in matched:
+            continue
+        if stanza.get('Version') == installed_versions[name]:
+            matched.add(name)
+            first.pop(name, None)
+            yield apt_package(stanza, installed_versions[name])
+        else:
+            first.setdefault(name, stanza)
+    for name, stanza in first.items():
+        yield apt_package(stanza, installed_versions[name])
+
+
+def apt_package(stanza, version):
+    return {
+        'name': stanza['Package'],
+        'version': version,
+        # Translated archives name the field Description-en
+        'description': stanza.get('Description', stanza.get('Description-en', '')).split('\n', 1)[0],
+        'depends_on': split_depends(stanza.get('Depends', ''), ','),
+    }
+
+
+def parse_pacman_info(lines):
+    # `pacman -Qi` / `pamac info` blocks; dependencies are space separated or "None"
+    for stanza in iter_deb822_stanzas(lines):
+        if 'Name' not in stanza:
+            continue
+        depends_on = stanza.get('Depends On', 'None')
+        yield {
+            'name': stanza['Name'],
+            'version': stanza.get('Version', ''),
+            'description': stanza.get('Description', ''),
+            'depends_on': depends_on.split() if depends_on != 'None' else [],
+        }
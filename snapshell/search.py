@@ -0,0 +1,87 @@
+# search.py
+import re
+import sqlite3
+from .db import get_connection
+
+# Words that carry no signal for package lookup
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from get how i in is it me my of on or
+please show that the this to use using want what when where which with would you your
+""".split())
+
+# Column weights for bm25(): tool_name, description, depends_on
+BM25_WEIGHTS = (10.0, 2.0, 0.5)
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+]*")
+
+# Reciprocal rank fusion constant for merging keyword and semantic rankings
+RRF_K = 60
+
+
+def tokenize(text):
+    return [tok for tok in TOKEN_RE.findall(text.lower()) if len(tok) > 1 and tok not in STOPWORDS]
+
+
+def build_match_expression(tokens):
+    # Prefix match every term so "compress" also hits "compression"
+    return " OR ".join(f'"{tok}"*' for tok in tokens)
+
+
+def search_packages(user_input, limit=30):
+    """
+    Rank installed packages against the user's query with the local FTS5 index
+    (BM25), falling back to a LIKE scan when FTS5 is not available. When the
+    optional vector index exists its results are fused in by rank.
+    """
+    from .vectors import semantic_search
+
+    keyword_results = keyword_search(user_input, limit)
+    semantic_results = semantic_search(user_input, limit)
+    if not semantic_results:
+        return keyword_results
+
+    scores = {}
+    for ranking in ([pkg["name"] for pkg in keyword_results], [name for name, _ in semantic_results]):
+        for position, name in enumerate(ranking):
+            scores[name] = scores.get(name, 0.0) + 1.0 / (RRF_K + position)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:limit]
+
+    packages = {pkg["name"]: pkg for pkg in keyword_results}
+    missing = [name for name in ranked if name not in packages]
+    if missing:
+        rows = get_connection().execute(
+            f"SELECT tool_name, version, description FROM system_config WHERE tool_name IN ({', '.join('?' * len(missing))})",
+            missing,
+        )
+        packages.update({row[0]: {"name": row[0], "version": row[1], "description": row[2]} for row in rows})
+    return [packages[name] for name in ranked if name in packages]
+
+
+def keyword_search(user_input, limit=30):
+    tokens = tokenize(user_input)
+    if not tokens:
+        return []
+
+    conn = get_connection()
+    try:
+        rows = conn.execute(f'''
+            SELECT s.tool_name, s.version, s.description
+            FROM package_index
+            JOIN system_config AS s ON s.rowid = package_index.rowid
+            WHERE package_index MATCH ?
+            ORDER BY bm25(package_index, {", ".join(map(str, BM25_WEIGHTS))})
+            LIMIT ?
+        ''', (build_match_expression(tokens), limit)).fetchall()
+    except sqlite3.OperationalError:
+        rows = like_search(conn, tokens, limit)
+
+    return [{"name": row[0], "version": row[1], "description": row[2]} for row in rows]
+
+
+def like_search(conn, tokens, limit):
+    clauses = " OR ".join(["tool_name LIKE ? OR description LIKE ?"] * len(tokens))
+    params = [f"%{tok}%" for tok in tokens for _ in range(2)]
+    return conn.execute(
+        f"SELECT tool_name, version, description FROM system_config WHERE {clauses} LIMIT ?",
+        (*params, limit),
+    ).fetchall()
@@ -0,0 +1,86 @@
+# sessions.py
+# Named conversations that outlive the process (snapshell --session NAME). Turns are
+# the command_suggestions rows the history writer stores anyway, referenced by id;
+# only the last TAIL_TURNS are replayed, older ones live on in a bounded digest.
+import json
+import time
+from .context import digest_message, digest_part, fit_digest
+from .db import get_connection
+
+# Turns sent verbatim with every prompt and loaded on resume
+TAIL_TURNS = 8
+# Estimated tokens the digest of older turns may take
+DIGEST_TOKENS = 200
+
+
+class Session:
+    def __init__(self, session_id, name, digest, turns):
+        self.id = session_id
+        self.name = name
+        self.digest = digest
+        self.turns = turns
+
+    @classmethod
+    def open(cls, name):
+        """
+        Load the named session, creating it if needed. Only the tail window
+        is read, however long the session has run.
+        """
+        conn = get_connection()
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO sessions (name, created_at, updated_at) VALUES (?, ?, ?)", (name, now, now)
+            )
+        session_id, digest = conn.execute("SELECT id, digest FROM sessions WHERE name = ?", (name,)).fetchone()
+        rows = conn.execute('''
+            SELECT c.user_input, c.command
+            FROM session_turns AS t JOIN command_suggestions AS c ON c.id = t.suggestion_id
+            WHERE t.session_id = ?
+            ORDER BY t.position DESC LIMIT ?
+        ''', (session_id, TAIL_TURNS)).fetchall()
+        return cls(session_id, name, json.loads(digest) if digest else [], rows[::-1])
+
+    def messages(self):
+        # Conversation history for the next prompt: the digest, then the tail verbatim
+        messages = [digest_message(self.digest)] if self.digest else []
+        for user_input, command in self.turns:
+            messages.append({"role": "user", "content": user_input})
+            messages.append({"role": "assistant", "content": command})
+        return messages
+
+    def add_turn(self, user_input, command):
+        """
+        Track a turn the history writer is storing for this session, folding
+        turns that leave the tail window into the digest.
+        """
+        self.turns.append((user_input, command))
+        folded = self.turns[:-TAIL_TURNS]
+        if folded:
+            del self.turns[:-TAIL_TURNS]
+            self.digest = fit_digest(self.digest + [digest_part(*turn) for turn in folded], DIGEST_TOKENS)
+        conn = get_connection()
+        with conn:
+            conn.execute(
+                "UPDATE sessions SET digest = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(self.digest) if self.digest else None, time.time(), self.id),
+            )
+
+
+def list_sessions():
+    return get_connection().execute('''
+        SELECT s.name, s.updated_at, (SELECT COUNT(*) FROM session_turns AS t WHERE t.session_id = s.id)
+        FROM sessions AS s ORDER BY s.updated_at DESC
+    ''').fetchall()
+
+
+def delete_session(name):
+    # The turns stay in the command history, only the session forgets them
+    conn = get_connection()
+    with conn:
+        row = conn.execute("SELECT id FROM sessions WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return False
+        conn.execute("DELETE FROM session_turns WHERE session_id = ?", (row[0],))
+        conn.execute("DELETE FROM sessions WHERE id = ?", (row[0],))
+    return True
@@ -0,0 +1,128 @@
+# streaming.py
+
+ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class JSONFieldStream:
+    """
+    Incremental parser for a flat JSON object arriving in chunks. feed() returns
+    (field, text, done) events as soon as characters of a string value are known,
+    so callers can render fields before the whole response has been received.
+    Non-string values are skipped.
+    """
+
+    def __init__(self):
+        self.state = "start"
+        self.key = []
+        self.field = None
+        self.escape = None
+        self.pending_surrogate = None
+        self.depth = 0
+        self.in_nested_string = False
+
+    def feed(self, chunk):
+        events = []
+        text = []
+
+        for char in chunk:
+            state = self.state
+            if state == "start":
+                # Tolerate prose or code fences before the object
+                if char == "{":
+                    self.state = "key_or_end"
+            elif state == "key_or_end":
+                if char == '"':
+                    self.key = []
+                    self.state = "key"
+                elif char == "}":
+                    self.state = "done"
+            elif state == "key":
+                if self.escape is not None:
+                    self.key.append(ESCAPES.get(char, char))
+                    self.escape = None
+                elif char == "\\":
+                    self.escape = ""
+                elif char == '"':
+                    self.state = "colon"
+                else:
+                    self.key.append(char)
+            elif state == "colon":
+                if char == ":":
+                    self.state = "value"
+            elif state == "value":
+                if char == '"':
+                    self.field = "".join(self.key)
+                    self.state = "string"
+                elif not char.isspace():
+                    self.depth = 1 if char in "[{" else 0
+                    self.state = "other"
+            elif state == "string":
+                if self.escape is not None:
+                    decoded = self.decode_escape(char)
+                    if decoded:
+                        text.append(decoded)
+                elif char == "\\":
+                    self.escape = ""
+                elif char == '"':
+                    events.append((self.field, "".join(text), True))
+                    text = []
+                    self.state = "key_or_end"
+                else:
+                    text.append(char)
+            elif state == "other":
+                self.skip_other_value(char)
+
+        if text and self.state == "string":
+            events.append((self.field, "".join(text), False))
+        return events
+
+    def decode_escape(self, char):
+        if self.escape == "":
+            if char != "u":
+                self.escape = None
+                return ESCAPES.get(char, char)
+            self.escape = "u"
+            return None
+
+        self.escape += char
+        if len(self.escape) < 5:
+            return None
+        code = int(self.escape[1:], 16)
+        self.escape = None
+        if 0xD800 <= code < 0xDC00:
+            self.pending_surrogate = code
+            return None
+        if 0xDC00 <= code < 0xE000 and self.pending_surrogate is not None:
+            code = 0x10000 + ((self.pending_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self.pending_surrogate = None
+        return chr(code)
+
+    def skip_other_value(self, char):
+        if self.in_nested_string:
+            if self.escape is not None:
+                self.escape = None
+            elif char == "\\":
+                self.escape = ""
+            elif char == '"':
+                self.in_nested_string = False
+        elif char == '"':
+            self.in_nested_string = True
+        elif char in "[{":
+            self.depth += 1
+        elif char in "]}":
+            if self.depth == 0:
+                # The object itself closed
+                self.state = "done"
+            else:
+                self.depth -= 1
+        elif char == "," and self.depth == 0:
+            self.state = "key_or_end"
+
+
+def extract_json_object(content):
+    # Streamed responses are not forced into JSON mode, so trim anything around the object
+    start, end = content.find("{"), content.rfind("}")
+    if start == -1 or end < start:
+        return content
+    return content[start:end + 1]
+
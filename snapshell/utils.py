@@ -1,144 +1,187 @@
 
-import sqlite3
+import functools
 import os
-from .package_managers import detect_package_manager
-from tqdm import tqdm
-
-
-DB_PATH = os.path.expanduser('~/.snapshell/system_info.db')
-
-# ANSI escape codes for colors
-RESET = "\033[0m"
-CYAN = "\033[36m"
-GREEN = "\033[32m"
-WHITE = "\033[37m"
-BLUE = "\033[34m"
-YELLOW = "\033[33m"
-RED = "\033[31m"
-
-def get_color(color:str):
-    col = color.lower()
-    if col == "cyan":
-        return CYAN
-    elif col == "green":
-        return GREEN
-    elif col == "white":
-        return WHITE
-    elif col == "blue":
-        return BLUE
-    elif col == "yellow":
-        return YELLOW
-    elif col == "red":
-        return RED
-    else:
-        return RESET
-    
-def print_color(text, color:str):
-    color = get_color(color)
-    print(f"{color}{text}{RESET}")
+import time
+from .catalog import get_catalog
+# RESET and get_color are unused here, re-exported for code that imported them from utils before colors.py
+from .colors import RESET, get_color, print_color  # noqa: F401
+from .db import DB_PATH, get_connection, get_metadata, set_metadata
+from .deps import write_dependency_edges
+from .executables import refresh_executables
+from .history import history_writer, iter_history
+from .metrics import record_span, span
+from .vectors import update_vector_index, vector_index_missing
+from .package_managers import PACKAGE_MANAGERS, detect_package_manager, package_manager_for
+from .package_managers.pipeline import chunked
+
+# Packages diffed and written per executemany batch while updating
+WRITE_CHUNK = 500
+# Minimum seconds between progress bar redraws
+PROGRESS_INTERVAL = 0.25
+
+
+@functools.lru_cache(maxsize=None)
+def get_package_manager():
+    """
+    Return the package manager recorded in the database, detecting and
+    recording it on first use.
+    """
+    conn = get_connection()
+    package_manager = package_manager_for(get_metadata(conn, "package_manager"))
+    if package_manager is None:
+        package_manager = detect_package_manager()
+        name = next(name for name, cls in PACKAGE_MANAGERS.items() if isinstance(package_manager, cls))
+        with conn:
+            set_metadata(conn, "package_manager", name)
+    return package_manager
 
 def fetch_system_info():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT tool_name, version FROM system_config")
-    system_info = cursor.fetchall()
-    conn.close()
-
-    package_manager = detect_package_manager()
-    installed_packages = [{"name": pkg[0], "version": pkg[1]} for pkg in system_info]
+    # The shared catalog, not a copy: one set of name/version columns per process
+    package_manager = get_package_manager()
 
     system_info_with_package_manager = {
-        "installed_packages": installed_packages,
+        "installed_packages": get_catalog(),
         "package_manager": package_manager.__class__.__name__
     }
 
     return system_info_with_package_manager
 
 def create_database():
-    if(os.path.exists(DB_PATH)):
-        
-        return
-    print_color("Creating database...", "CYAN")
-    os.makedirs(os.path.dirname(DB_PATH))
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS system_config (
-            tool_name TEXT PRIMARY KEY,
-            version TEXT,
-            description TEXT,
-            depends_on TEXT
-        )
-    ''')
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS command_suggestions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_input TEXT,
-            command TEXT,
-            explanation TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-def update_database():
-    create_database()
-    print_color("Updating database...", "YELLOW")
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    package_manager = detect_package_manager()
-    installed_packages = package_manager.get_installed_packages()
-
-    # Initialize the progress bar
-    with tqdm(total=len(installed_packages), desc="Updating database", unit="pkg") as pbar:
-        for package in installed_packages:
-            cursor.execute('''
-                INSERT OR REPLACE INTO system_config (tool_name, version, description, depends_on) 
-                VALUES (?, ?, ?, ?)
-            ''', (package['name'], package['version'], package.get('description', ''), ', '.join(package.get('depends_on', []))))
-            pbar.update(1)  # Update the progress bar
-
-    conn.commit()
-    conn.close()
-    print_color("Database updated successfully.", "GREEN")
-
-def save_command_suggestion(user_input, command, explanation):
-    create_database()
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO command_suggestions (user_input, command, explanation)
-        VALUES (?, ?, ?)
-    ''', (user_input, command, explanation))
-    conn.commit()
-    conn.close()
+    if not os.path.exists(DB_PATH):
+        print_color("Creating database...", "CYAN")
+    # Opening the shared connection creates the file and applies migrations
+    get_connection()
+
+def has_packages():
+    return get_connection().execute("SELECT 1 FROM system_config LIMIT 1").fetchone() is not None
+
+def update_database(force=False):
+    from tqdm import tqdm
+
+    with span("update_database", force=force) as attributes:
+        create_database()
+        conn = get_connection()
+        cursor = conn.cursor()
+
+        package_manager = get_package_manager()
+        fingerprint = package_manager.fingerprint()
+        if not force and fingerprint and fingerprint == get_metadata(cursor, "package_fingerprint"):
+            if vector_index_missing():
+                with conn:
+                    update_vector_index(conn)
+            # Commands installed outside the package manager (pip, cargo, ~/bin) still show up
+            with span("executables.update"), conn:
+                refresh_executables(conn, package_manager)
+            attributes["up_to_date"] = True
+            print_color("Database is already up to date.", "GREEN")
+            return
+
+        print_color("Updating database...", "YELLOW")
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen_packages (tool_name TEXT PRIMARY KEY) WITHOUT ROWID")
+        added = changed = removed = 0
+        packages = package_manager.iter_installed_packages()
+
+        # Packages stream in chunks: each chunk is diffed against the stored rows and
+        # only what differs is written, so memory stays flat however many are installed.
+        # Reading and writing interleave, so their times are added up per stage.
+        chunks = chunked(packages, WRITE_CHUNK)
+        read_seconds = 0.0
+        started = time.perf_counter()
+        with conn, tqdm(desc="Updating database", unit="pkg", mininterval=PROGRESS_INTERVAL) as pbar:
+            conn.execute("DELETE FROM temp.seen_packages")
+            while True:
+                # Runs the package manager's parsers or subprocesses for the next chunk
+                pull_started = time.perf_counter()
+                chunk = next(chunks, None)
+                read_seconds += time.perf_counter() - pull_started
+                if chunk is None:
+                    break
+                installed = {
+                    package['name']: (package['version'], package.get('description', ''), ', '.join(package.get('depends_on', [])))
+                    for package in chunk
+                }
+                cursor.executemany("INSERT OR IGNORE INTO temp.seen_packages (tool_name) VALUES (?)", [(name,) for name in installed])
+                existing = {
+                    row[0]: row[1:]
+                    for row in cursor.execute(
+                        f"SELECT tool_name, version, description, depends_on FROM system_config WHERE tool_name IN ({', '.join('?' * len(installed))})",
+                        list(installed),
+                    )
+                }
+                added_rows = [(name, *fields) for name, fields in installed.items() if name not in existing]
+                changed_rows = [(*fields, name) for name, fields in installed.items() if name in existing and existing[name] != fields]
+
+                cursor.executemany(
+                    "INSERT INTO system_config (tool_name, version, description, depends_on) VALUES (?, ?, ?, ?)", added_rows
+                )
+                # UPDATE keeps the rowid stable so the FTS triggers stay consistent
+                cursor.executemany(
+                    "UPDATE system_config SET version = ?, description = ?, depends_on = ? WHERE tool_name = ?", changed_rows
+                )
+                # Keep the dependency edges in step with the rows just written
+                cursor.executemany("DELETE FROM package_dependencies WHERE tool_name = ?", [(row[-1],) for row in changed_rows])
+                for row in added_rows:
+                    write_dependency_edges(cursor, row[0], row[3])
+                for row in changed_rows:
+                    write_dependency_edges(cursor, row[3], row[2])
+                added += len(added_rows)
+                changed += len(changed_rows)
+                pbar.update(len(installed))
+
+            removed_rows = cursor.execute(
+                "SELECT tool_name FROM system_config WHERE tool_name NOT IN (SELECT tool_name FROM temp.seen_packages)"
+            ).fetchall()
+            cursor.executemany("DELETE FROM system_config WHERE tool_name = ?", removed_rows)
+            cursor.executemany("DELETE FROM package_dependencies WHERE tool_name = ?", removed_rows)
+            removed = len(removed_rows)
+            conn.execute("DELETE FROM temp.seen_packages")
+            if added or changed or removed:
+                # Tells every process holding a package catalog to reload it
+                set_metadata(cursor, "packages_generation", str(time.time_ns()))
+            if fingerprint:
+                set_metadata(cursor, "package_fingerprint", fingerprint)
+        record_span("packages.read", read_seconds * 1000, manager=type(package_manager).__name__, packages=pbar.n)
+        record_span("db.write", (time.perf_counter() - started - read_seconds) * 1000, packages=pbar.n)
+
+        # Re-embeds only the packages whose name or description changed
+        with span("vectors.update"), conn:
+            update_vector_index(conn)
+
+        # Only $PATH directories whose mtime moved are rescanned
+        with span("executables.update") as executable_attributes, conn:
+            executable_attributes["directories"] = refresh_executables(conn, package_manager, force)
+
+        attributes.update(added=added, updated=changed, removed=removed)
+
+        print_color(f"Database updated successfully ({added} added, {changed} updated, {removed} removed).", "GREEN")
+
+def save_command_suggestion(user_input, command, explanation, session_id=None):
+    # Written in the background, off the path that prints the suggestion
+    history_writer.submit(user_input, command, explanation, session_id)
     
-def view_history():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('SELECT user_input, command, explanation, timestamp FROM command_suggestions ORDER BY timestamp DESC')
-    results = cursor.fetchall()
-    conn.close()
-
-    if not results:
-        print_color("No history found.", "YELLOW")
-        return
-
-    print_color("Command History:", "CYAN")
-    for entry in results:
-        user_input, command, explanation, timestamp = entry
+def view_history(query=None, limit=None):
+    # Rows are printed as each keyset page arrives instead of loading the whole history
+    found = False
+    for entry in iter_history(query, limit):
+        if not found:
+            print_color("Command History:", "CYAN")
+            found = True
+        _, user_input, command, explanation, timestamp = entry
         print_color(f"User Input: {user_input}", "GREEN")
         print_color(f"Command: {command}", "WHITE")
         print_color(f"Explanation: {explanation}", "BLUE")
         print_color(f"Timestamp: {timestamp}", "YELLOW")
         print("-" * 40)
 
+    if not found:
+        print_color("No matching history found." if query else "No history found.", "YELLOW")
+
 def clear_history():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM command_suggestions')
-    conn.commit()
-    conn.close()
+    history_writer.flush()
+    conn = get_connection()
+    with conn:
+        conn.execute('DELETE FROM command_suggestions')
+        # Sessions keep their names but forget what was said
+        conn.execute('DELETE FROM session_turns')
+        conn.execute('UPDATE sessions SET digest = NULL')
     print_color("Command history cleared successfully.", "GREEN")
\ No newline at end of file
@@ -0,0 +1,170 @@
+# validate.py
+# Local checks of a suggested command: every program must be installed and every
+# option must appear in its man page or --help output. Option lists are parsed
+# once per executable and kept in SQLite, least recently used evicted first.
+import os
+import re
+import shutil
+import subprocess
+import time
+from .db import get_connection
+from .executables import SHELL_BUILTINS, WRAPPERS, command_stages, executable_missing, path_package
+
+# Parsed option lists kept in the database
+OPTION_CACHE_MAX_ENTRIES = 500
+HELP_TIMEOUT_SECONDS = 2
+# Fewer options than this means the help text wasn't understood, flags go unchecked
+MIN_OPTIONS = 3
+# Never started just to read their --help
+NEVER_RUN = frozenset(('reboot', 'shutdown', 'halt', 'poweroff', 'init', 'telinit'))
+
+# Option lines start with a dash after the indentation, the definition ends at a wide gap
+OPTION_LINE_RE = re.compile(r"^\s{0,16}(-\S.*?)(?:\s{2,}|\t|$)")
+OPTION_RE = re.compile(r"(?<![\w-])(--?[A-Za-z0-9?#][\w.+#-]*)")
+# The usage paragraph, or a man page's SYNOPSIS section
+USAGE_RE = re.compile(r"^[ \t]*(?:usage:|SYNOPSIS\b).*?(?:\n[ \t]*\n(?=\S)|\Z)", re.IGNORECASE | re.MULTILINE | re.DOTALL)
+# Usage of tools like git, apt or systemctl, whose later options belong to a subcommand
+SUBCOMMAND_RE = re.compile(r"(?<![\w-])<?(?:sub)?command>?(?![\w-])", re.IGNORECASE)
+NEGATABLE_RE = re.compile(r"--\[no-\]([\w-]+)")
+OVERSTRIKE_RE = re.compile(r".\x08")
+NUMBER_RE = re.compile(r"^-\d+$")
+
+# path -> (mtime_ns, options or None, subcommands)
+_options = {}
+
+
+def parse_options(text):
+    """
+    Collect the options a man page or --help text documents, e.g. "-a",
+    "--all" and "-name" from "  -a, --all   do not ignore entries".
+    """
+    options = set()
+    for line in OVERSTRIKE_RE.sub("", text).splitlines():
+        match = OPTION_LINE_RE.match(line)
+        if not match:
+            continue
+        definition = match.group(1)
+        # --[no-]color documents both --color and --no-color
+        options.update("--no-" + option for option in NEGATABLE_RE.findall(definition))
+        for option in OPTION_RE.findall(definition.replace("[no-]", "")):
+            options.add(option.rstrip(".,"))
+    return options
+
+
+def read_help(name, path):
+    # Man pages are read without running the program. --help only runs for a file
+    # the package manager installed into a $PATH directory, never for one that
+    # merely shares the name of a packaged command
+    env = dict(os.environ, LC_ALL="C", MANWIDTH="200", MANPAGER="cat", PAGER="cat")
+    commands = [["man", name]]
+    if name not in NEVER_RUN and path_package(path) is not None:
+        commands.append([path, "--help"])
+    for command in commands:
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, errors="replace",
+                                    stdin=subprocess.DEVNULL, env=env, timeout=HELP_TIMEOUT_SECONDS)
+        except (OSError, subprocess.SubprocessError):
+            continue
+        text = result.stdout + result.stderr
+        options = parse_options(text)
+        if len(options) >= MIN_OPTIONS:
+            usage = USAGE_RE.search(text)
+            return options, bool(usage and SUBCOMMAND_RE.search(usage.group()))
+    return None, False
+
+
+def option_index(name):
+    """
+    Return (options, subcommands) for a program, parsing its documentation on
+    first use. options is None when nothing usable was found.
+    """
+    path = name if "/" in name else shutil.which(name)
+    if not path:
+        return None, False
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return None, False
+
+    cached = _options.get(path)
+    if cached and cached[0] == mtime_ns:
+        return cached[1], cached[2]
+
+    conn = get_connection()
+    now = time.time()
+    row = conn.execute(
+        "SELECT options, subcommands FROM command_options WHERE path = ? AND mtime_ns = ?", (path, mtime_ns)
+    ).fetchone()
+    with conn:
+        if row is not None:
+            options = set(row[0].split("\n")) if row[0] is not None else None
+            subcommands = bool(row[1])
+            conn.execute("UPDATE command_options SET last_used = ? WHERE path = ?", (now, path))
+        else:
+            # An upgraded binary has a new mtime and is parsed again
+            options, subcommands = read_help(os.path.basename(path), path)
+            conn.execute('''
+                INSERT INTO command_options (path, mtime_ns, options, subcommands, last_used) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (path) DO UPDATE SET
+                    mtime_ns = excluded.mtime_ns, options = excluded.options,
+                    subcommands = excluded.subcommands, last_used = excluded.last_used
+            ''', (path, mtime_ns, "\n".join(sorted(options)) if options is not None else None, subcommands, now))
+            conn.execute('''
+                DELETE FROM command_options WHERE path IN (
+                    SELECT path FROM command_options ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            ''', (OPTION_CACHE_MAX_ENTRIES,))
+    _options[path] = (mtime_ns, options, subcommands)
+    return options, subcommands
+
+
+def unknown_options(args, options, subcommands):
+    unknown = []
+    for arg in args:
+        if arg == "--":
+            break
+        if not arg.startswith("-"):
+            # Options after a subcommand are the subcommand's own
+            if subcommands:
+                break
+            continue
+        if arg == "-" or NUMBER_RE.match(arg):
+            continue
+        flag = arg.split("=", 1)[0]
+        if flag in options:
+            continue
+        if flag.startswith("--"):
+            # getopt_long accepts unambiguous abbreviations
+            if any(option.startswith(flag) for option in options):
+                continue
+        elif "-" + flag[1:2] in options:
+            # Clustered short flags or an attached value, e.g. -la or -n5
+            continue
+        unknown.append(flag)
+    return unknown
+
+
+def validate_command(command):
+    """
+    Problems found in a suggested command, as short sentences for the user
+    and for a correction prompt. An empty list means nothing looked wrong.
+    """
+    problems = []
+    for name, args in command_stages(command):
+        if name in SHELL_BUILTINS:
+            continue
+        if executable_missing(name):
+            # A program can appear again inside a $(...) substitution
+            if f"{name} is not installed" not in problems:
+                problems.append(f"{name} is not installed")
+            continue
+        # Relative paths depend on where the command is run
+        if name in WRAPPERS or ("/" in name and not os.path.isabs(os.path.expanduser(name))):
+            continue
+
+        options, subcommands = option_index(name)
+        if options is None:
+            continue
+        for flag in unknown_options(args, options, subcommands):
+            problems.append(f"{os.path.basename(name)} has no option {flag}")
+    return problems
@@ -0,0 +1,155 @@
+# vectors.py
+# Optional semantic index over package descriptions. Needs numpy (pip install snapshell[semantic]);
+# every entry point degrades to a no-op without it.
+import hashlib
+import os
+import re
+import zlib
+from .db import DB_PATH, get_connection
+from .search import STOPWORDS
+
+VECTORS_PATH = os.path.join(os.path.dirname(DB_PATH), 'package_vectors.npy')
+
+# Hashing-trick dimensions, must stay a power of two
+DIM = 512
+NGRAM_SIZES = (3, 4)
+NGRAM_WEIGHT = 0.5
+# Cosine similarity below this is treated as unrelated
+MIN_SIMILARITY = 0.15
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+_matrix_cache = {}
+
+
+def load_numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def features(text):
+    # Whole words plus character n-grams, so "compress" still meets "compression" and "compressor"
+    for word in WORD_RE.findall(text.lower()):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        yield word, 1.0
+        padded = f"<{word}>"
+        for size in NGRAM_SIZES:
+            for start in range(len(padded) - size + 1):
+                yield padded[start:start + size], NGRAM_WEIGHT
+
+
+def embed(texts, np):
+    matrix = np.zeros((len(texts), DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for feature, weight in features(text):
+            digest = zlib.crc32(feature.encode('utf-8'))
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            matrix[row, digest & (DIM - 1)] += sign * weight
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def package_text(name, description):
+    return f"{name.replace('-', ' ')} {description or ''}"
+
+
+def content_hash(name, description):
+    return hashlib.blake2b(package_text(name, description).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def update_vector_index(conn=None):
+    """
+    Bring the on-disk matrix in line with system_config. Rows whose name and
+    description are unchanged are copied from the previous matrix, only new or
+    changed packages are embedded again.
+    """
+    np = load_numpy()
+    if np is None:
+        return
+    conn = conn or get_connection()
+
+    packages = conn.execute("SELECT tool_name, description FROM system_config ORDER BY tool_name").fetchall()
+    previous = {name: (row, digest) for name, row, digest in conn.execute(
+        "SELECT tool_name, row, content_hash FROM package_vectors"
+    )}
+    old_matrix = load_matrix(np)
+    if old_matrix is None or old_matrix.shape[1] != DIM:
+        previous = {}
+
+    matrix = np.zeros((len(packages), DIM), dtype=np.float32)
+    stale_rows, stale_texts = [], []
+    rows = []
+    for row, (name, description) in enumerate(packages):
+        digest = content_hash(name, description)
+        if name in previous and previous[name][1] == digest and previous[name][0] < len(old_matrix):
+            matrix[row] = old_matrix[previous[name][0]]
+        else:
+            stale_rows.append(row)
+            stale_texts.append(package_text(name, description))
+        rows.append((name, row, digest))
+    if stale_rows:
+        matrix[stale_rows] = embed(stale_texts, np)
+
+    # Write beside the live file and swap, so readers holding a memory map are unaffected
+    temp_path = VECTORS_PATH + '.tmp'
+    with open(temp_path, 'wb') as vectors_file:
+        np.save(vectors_file, matrix)
+    os.replace(temp_path, VECTORS_PATH)
+
+    conn.execute("DELETE FROM package_vectors")
+    conn.executemany("INSERT INTO package_vectors (tool_name, row, content_hash) VALUES (?, ?, ?)", rows)
+    return len(stale_rows)
+
+
+def vector_index_missing():
+    return load_numpy() is not None and not os.path.exists(VECTORS_PATH)
+
+
+def load_matrix(np):
+    try:
+        stat = os.stat(VECTORS_PATH)
+    except OSError:
+        return None
+    key = (stat.st_mtime_ns, stat.st_size)
+    if key not in _matrix_cache:
+        _matrix_cache.clear()
+        _matrix_cache[key] = np.load(VECTORS_PATH, mmap_mode='r')
+    return _matrix_cache[key]
+
+
+def semantic_search_batch(queries, limit=30):
+    """
+    Cosine top-k over package vectors for several queries at once. Returns one
+    list of (tool_name, similarity) per query, or None when the index is unavailable.
+    """
+    np = load_numpy()
+    if np is None:
+        return None
+    matrix = load_matrix(np)
+    if matrix is None or matrix.shape[0] == 0 or matrix.shape[1] != DIM:
+        return None
+
+    names = dict(get_connection().execute("SELECT row, tool_name FROM package_vectors"))
+    scores = embed(queries, np) @ np.asarray(matrix).T
+    limit = min(limit, scores.shape[1])
+
+    results = []
+    for query_scores in scores:
+        top = np.argpartition(-query_scores, limit - 1)[:limit]
+        top = top[np.argsort(-query_scores[top])]
+        results.append([
+            (names[int(row)], float(query_scores[row]))
+            for row in top
+            if query_scores[row] >= MIN_SIMILARITY and int(row) in names
+        ])
+    return results
+
+
+def semantic_search(user_input, limit=30):
+    results = semantic_search_batch([user_input], limit)
+    return results[0] if results else None